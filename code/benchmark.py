@@ -0,0 +1,385 @@
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import gymnasium  # gymnasium overrides SDL_AUDIODRIVER on import, so set the drivers afterwards
+os.environ["SDL_VIDEODRIVER"] = "dummy"
+os.environ["SDL_AUDIODRIVER"] = "dummy"
+
+import pygame
+
+from game_env import PlatformerEnv
+from geometry import GeometryIndex
+from inference import run_fleet
+from level_compiler import load_level_bundle
+from main import Game
+from numpy_policy import NumpyPolicy, export
+from observation import CHANNELS, ObservationBuilder
+from player import Player
+from settings import screen_height, screen_width
+from stable_baselines3 import PPO
+from stable_baselines3.common.vec_env import DummyVecEnv
+from support import asset_cache_info, clear_asset_cache
+from shm_vec_env import SharedMemoryVecEnv
+from vec_env import PlatformerVecEnv
+
+
+# pygame calls that hand back a new Surface
+ALLOCATING_METHODS = {"copy", "convert", "convert_alpha", "subsurface", "render", "render_to"}
+ALLOCATING_MODULES = {"pygame.transform", "pygame.image", "pygame.surfarray"}
+
+
+class SurfaceCounter:
+    """Counts the Surfaces allocated while active, as a context manager
+
+    pygame.Surface(...) and the Surface-returning methods and module functions (copy, flip, font rendering...)
+    are counted per name in counts.
+    """
+
+    def __init__(self):
+        self.counts = {}
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+    def _count(self, name):
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def _profile(self, frame, event, arg):
+        if event != "c_call":
+            return
+        name = getattr(arg, "__name__", None)
+        owner = getattr(arg, "__self__", None)
+        if isinstance(owner, (pygame.Surface, pygame.font.Font)) and name in ALLOCATING_METHODS:
+            self._count(f"{type(owner).__name__}.{name}")
+        elif getattr(arg, "__module__", None) in ALLOCATING_MODULES:
+            self._count(f"{arg.__module__}.{name}")
+
+    def __enter__(self):
+        counter = self
+        surface_type = pygame.Surface
+
+        # constructing a type is not reported to profile hooks, so pygame.Surface is swapped for a counting subclass
+        class CountedSurface(surface_type):
+            def __init__(self, *args, **kwargs):
+                counter._count("pygame.Surface")
+                super().__init__(*args, **kwargs)
+
+        self._surface_type = surface_type
+        pygame.Surface = CountedSurface
+        sys.setprofile(self._profile)
+        return self
+
+    def __exit__(self, *exc_info):
+        sys.setprofile(None)
+        pygame.Surface = self._surface_type
+        return False
+
+
+def steps_per_second(env, steps=2000, seed=0, draw=False):
+    """Runs random actions through env and returns the achieved steps/sec
+
+    draw also draws the game after every step, the work a step did before only rendering envs drew.
+    """
+    env.action_space.seed(seed)
+    with contextlib.redirect_stdout(io.StringIO()):
+        env.reset(seed=seed)
+        start = time.perf_counter()
+        for _ in range(steps):
+            _, _, terminated, truncated, _ = env.step(env.action_space.sample())
+            if draw:
+                env.unwrapped.game.draw()
+            if terminated or truncated:
+                env.reset()
+        elapsed = time.perf_counter() - start
+    return steps / elapsed
+
+
+def bench_headless(steps=2000):
+    """Compares the headless env against one that loads audio and artwork and draws every step, as all envs did"""
+    drawing = steps_per_second(PlatformerEnv(render_mode=None, headless=False), steps, draw=True)
+    headless = steps_per_second(PlatformerEnv(render_mode=None), steps)
+    print(f"with assets  : {drawing:8.0f} steps/sec")
+    print(f"headless     : {headless:8.0f} steps/sec ({headless / drawing:.1f}x)")
+
+
+def bench_draw(frames=1000):
+    """Compares Game.update, all a training step runs, against updating and drawing every frame"""
+    pygame.init()
+    # assets are converted to the display format only when a display mode exists, as in human mode
+    screen = pygame.display.set_mode((screen_width, screen_height))
+    clear_asset_cache()
+    game = Game(external_screen=screen)
+    rates = {}
+    for name, frame in (("update + draw", game.run), ("update only", game.update)):
+        game.reset()
+        game.begin_episode()
+        start = time.perf_counter()
+        for _ in range(frames):
+            frame()
+        rates[name] = frames / (time.perf_counter() - start)
+    print(f"update + draw: {rates['update + draw']:8.0f} frames/sec")
+    print(f"update only  : {rates['update only']:8.0f} frames/sec ({rates['update only'] / rates['update + draw']:.1f}x)")
+
+
+def bench_allocations(frames=600):
+    """Counts the Surfaces allocated by updating and drawing frames once the game has warmed up"""
+    pygame.init()
+    screen = pygame.display.set_mode((screen_width, screen_height))
+    game = Game(external_screen=screen)
+    player = game.level.player.sprite
+    # walk left, right and jump through invincibility so every animation variant is shown
+    actions = [0] * 60 + [1] * 60 + [2] * 60
+    frame = 0
+    player.get_input = lambda ai_action=None: Player.get_input(player, actions[frame % len(actions)])
+
+    def play():
+        nonlocal frame
+        game.reset()
+        for frame in range(frames):
+            if frame % 200 == 100:
+                player.get_damage()
+            game.run()
+
+    # the first pass loads effects like the explosion into the asset cache
+    play()
+    with SurfaceCounter() as counter:
+        play()
+    print(f"{frames} frames: {counter.total} Surfaces allocated {counter.counts or ''}")
+
+
+def bench_rgb_array(steps=500):
+    """Steps/sec of an env that renders every step to an rgb_array frame"""
+    env = PlatformerEnv(render_mode="rgb_array")
+    env.action_space.seed(0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        env.reset(seed=0)
+        start = time.perf_counter()
+        for _ in range(steps):
+            _, _, terminated, truncated, _ = env.step(env.action_space.sample())
+            frame = env.render()
+            if terminated or truncated:
+                env.reset()
+        elapsed = time.perf_counter() - start
+    print(f"rgb_array    : {steps / elapsed:8.0f} steps/sec, frames {frame.shape}")
+
+
+def bench_reset(resets=200):
+    """Compares restoring the level template against rebuilding the whole Game"""
+    env = PlatformerEnv(render_mode=None)
+    with contextlib.redirect_stdout(io.StringIO()):
+        env.reset(seed=0)
+        for _ in range(300):
+            env.step(1)
+
+        start = time.perf_counter()
+        for _ in range(resets):
+            Game(headless=True)
+        rebuild = (time.perf_counter() - start) / resets
+
+        start = time.perf_counter()
+        for _ in range(resets):
+            env.game.reset()
+        restore = (time.perf_counter() - start) / resets
+
+        start = time.perf_counter()
+        for reset in range(resets):
+            env.reset(options={"level": env.levels[reset % len(env.levels)]})
+        switch = (time.perf_counter() - start) / resets
+    print(f"rebuild Game : {rebuild * 1e3:8.3f} ms/reset")
+    print(f"restore level: {restore * 1e3:8.3f} ms/reset ({rebuild / restore:.0f}x)")
+    print(f"switch level : {switch * 1e3:8.3f} ms/env.reset ({rebuild / switch:.0f}x)")
+
+
+def bench_backend(steps=2000):
+    """Compares the headless pygame Game against the array simulation backend"""
+    pygame_backend = steps_per_second(PlatformerEnv(render_mode=None), steps)
+    numpy_backend = steps_per_second(PlatformerEnv(render_mode=None, backend="numpy"), steps)
+    print(f"pygame backend: {pygame_backend:8.0f} steps/sec")
+    print(f"numpy backend : {numpy_backend:8.0f} steps/sec ({numpy_backend / pygame_backend:.1f}x)")
+
+
+def bench_observation(calls=20000, num_worlds=256):
+    """Atlas memory per level and microseconds per observation, for one player and for a batch"""
+    bundles = [load_level_bundle(level) for level in range(4)]
+    rng = np.random.default_rng(0)
+    enemies = rng.integers(0, 3800, size=(10, 2)).tolist()
+    coins = rng.integers(0, 3800, size=(30, 2)).tolist()
+    levels = rng.integers(0, 4, size=num_worlds)
+    x = rng.integers(0, 3800, size=num_worlds)
+    y = rng.integers(0, 700, size=num_worlds)
+    for channels in (("terrain",), CHANNELS):
+        builder = ObservationBuilder(bundles, channels)
+        atlas, materialized = builder.atlas_bytes()
+        print(f"{len(channels)} channel(s): atlas {atlas / 1024:6.1f} KiB/level "
+              f"(every window copied out would take {materialized / 2**20:6.1f} MiB)")
+        start = time.perf_counter()
+        for call in range(calls):
+            builder.observe(call % 4, 1000, 300, enemies, coins)
+        single = (time.perf_counter() - start) / calls
+        start = time.perf_counter()
+        for _ in range(calls // 100):
+            builder.observe_batch(levels, x, y)
+        batch = (time.perf_counter() - start) / (calls // 100) / num_worlds
+        print(f"{'':14s}{single * 1e6:6.2f} us/observation, {batch * 1e6:6.2f} us/world in batches of {num_worlds}")
+
+
+def bench_geometry(calls=20000, num_worlds=256):
+    """Microseconds per geometry feature vector, for one player and for a batch spread over every level"""
+    index = GeometryIndex([load_level_bundle(level) for level in range(4)])
+    rng = np.random.default_rng(0)
+    levels = rng.integers(0, 4, size=num_worlds)
+    x = rng.integers(0, 3800, size=num_worlds)
+    y = rng.integers(0, 700, size=num_worlds)
+    start = time.perf_counter()
+    for call in range(calls):
+        index.features(call % 4, 1000 + call % 500, 300)
+    single = (time.perf_counter() - start) / calls
+    start = time.perf_counter()
+    for _ in range(calls // 100):
+        index.features_batch(levels, x, y)
+    batch = (time.perf_counter() - start) / (calls // 100) / num_worlds
+    print(f"{single * 1e6:6.2f} us/player, {batch * 1e6:6.2f} us/world in batches of {num_worlds}")
+
+
+def bench_vec(steps=500, sizes=(1, 16, 64, 128, 256, 512)):
+    """Steps/sec of the batched VecEnv as the number of worlds grows, against one headless env"""
+    single = steps_per_second(PlatformerEnv(render_mode=None), steps)
+    print(f"PlatformerEnv  : {single:9.0f} steps/sec")
+    rng = np.random.default_rng(0)
+    for num_envs in sizes:
+        env = PlatformerVecEnv(num_envs, levels=(0, 1, 2, 3), seed=0)
+        env.reset()
+        actions = rng.integers(0, 4, size=(steps, num_envs))
+        start = time.perf_counter()
+        for action in actions:
+            env.step(action)
+        rate = steps * num_envs / (time.perf_counter() - start)
+        print(f"VecEnv N={num_envs:<5}: {rate:9.0f} steps/sec ({rate / single:5.1f}x, {rate / num_envs:6.0f} calls/sec)")
+
+
+def bench_processes(steps=1000, sizes=None):
+    """Steps/sec of SharedMemoryVecEnv from one worker process up to one per core, against one headless env"""
+    single = steps_per_second(PlatformerEnv(render_mode=None), steps)
+    print(f"PlatformerEnv : {single:9.0f} steps/sec")
+    sizes = sizes or range(1, os.cpu_count() + 1)
+    rng = np.random.default_rng(0)
+    for workers in sizes:
+        env = SharedMemoryVecEnv(workers, seed=0)
+        env.reset()
+        actions = rng.integers(0, 4, size=(steps, workers))
+        start = time.perf_counter()
+        for action in actions:
+            env.step(action)
+        rate = steps * workers / (time.perf_counter() - start)
+        env.close()
+        print(f"workers={workers:<4}: {rate:9.0f} steps/sec ({rate / single:5.2f}x)")
+
+
+def bench_instances(steps=300, sizes=(1, 4, 16)):
+    """Many rgb_array envs in one process: decoded assets are shared, each env draws into its own Surface"""
+    rng = np.random.default_rng(0)
+    for count in sizes:
+        clear_asset_cache()
+        env = DummyVecEnv([lambda: PlatformerEnv(render_mode="rgb_array") for _ in range(count)])
+        with contextlib.redirect_stdout(io.StringIO()):
+            env.reset()
+            start = time.perf_counter()
+            for _ in range(steps):
+                env.step(rng.integers(0, 4, size=count))
+                frames = env.get_images()
+            elapsed = time.perf_counter() - start
+        distinct = len({frame.tobytes() for frame in frames})
+        print(f"{count:3d} envs: {steps * count / elapsed:7.0f} steps+frames/sec, {asset_cache_info()['entries']} cached assets, "
+              f"{distinct} distinct frames")
+        env.close()
+
+
+def bench_inference(steps=300, sizes=(1, 4, 16, 64)):
+    """An untrained PPO policy driving threads of envs through one InferenceServer, against predict per step"""
+    env = PlatformerEnv(render_mode=None, frame_stack=4)
+    model = PPO("MultiInputPolicy", env, device="cpu")
+    with contextlib.redirect_stdout(io.StringIO()):
+        obs, _ = env.reset(seed=0)
+        start = time.perf_counter()
+        for _ in range(steps):
+            action, _ = model.predict(obs, deterministic=True)
+            obs, _, terminated, truncated, _ = env.step(action)
+            if terminated or truncated:
+                obs, _ = env.reset()
+        single = steps / (time.perf_counter() - start)
+    print(f"predict per step: {single:7.0f} steps/sec")
+    for count in sizes:
+        with contextlib.redirect_stdout(io.StringIO()):
+            _, elapsed, stats = run_fleet(model, count, steps, env_kwargs=dict(frame_stack=4))
+        rate = steps * count / elapsed
+        print(f"{count:3d} instances  : {rate:7.0f} steps/sec ({rate / single:4.1f}x), mean batch {stats['mean_batch']:5.1f}, "
+              f"p50 {stats['p50_ms']:6.2f} ms, p99 {stats['p99_ms']:6.2f} ms")
+
+
+def bench_export(calls=2000, samples=2000):
+    """PPO.load and predict against the exported NumpyPolicy, fp32 and int8, on a policy shaped like train.py's
+
+    Load times are for a fresh interpreter, imports included; agreement is over observations sampled from
+    the observation space, which an untrained policy splits more finely than a trained one would.
+    """
+    env = PlatformerEnv(render_mode=None, frame_stack=4)
+    model = PPO("MultiInputPolicy", env, device="cpu", policy_kwargs=dict(net_arch=dict(pi=[256, 256], vf=[256, 256])))
+    env.observation_space.seed(0)
+    observations = [env.observation_space.sample() for _ in range(samples)]
+    batch = {key: np.stack([obs[key] for obs in observations]) for key in observations[0]}
+    expected, _ = model.predict(batch, deterministic=True)
+
+    def load_seconds(statement):
+        script = f"import time; start = time.perf_counter(); {statement}; print(time.perf_counter() - start)"
+        return min(float(subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True).stdout)
+                   for _ in range(3))
+
+    def latency(policy):
+        start = time.perf_counter()
+        for obs in observations[:calls]:
+            policy.predict(obs, deterministic=True)
+        return (time.perf_counter() - start) / calls
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "policy.zip")
+        model.save(path)
+        load = load_seconds(f"from stable_baselines3 import PPO; PPO.load({path!r}, device='cpu')")
+        print(f"PPO          : load {load:6.2f} s, {latency(model) * 1e6:6.0f} us/action, {os.path.getsize(path) / 1e3:6.0f} kB")
+        for int8 in (False, True):
+            exported = os.path.join(directory, "policy.npz")
+            export(path, exported, int8=int8)
+            policy = NumpyPolicy.load(exported)
+            load = load_seconds(f"from numpy_policy import NumpyPolicy; NumpyPolicy.load({exported!r})")
+            agreement = np.mean(policy.predict(batch)[0] == expected)
+            print(f"NumPy {'int8' if int8 else 'fp32'}   : load {load:6.2f} s, {latency(policy) * 1e6:6.0f} us/action, "
+                  f"{os.path.getsize(exported) / 1e3:6.0f} kB, {agreement:.1%} same actions")
+
+
+BENCHMARKS = {
+    "headless": bench_headless,
+    "reset": bench_reset,
+    "draw": bench_draw,
+    "rgb_array": bench_rgb_array,
+    "allocations": bench_allocations,
+    "backend": bench_backend,
+    "observation": bench_observation,
+    "geometry": bench_geometry,
+    "vec": bench_vec,
+    "processes": bench_processes,
+    "instances": bench_instances,
+    "inference": bench_inference,
+    "export": bench_export,
+}
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        print(f"== {name} ==")
+        BENCHMARKS[name]()
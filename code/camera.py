@@ -0,0 +1,61 @@
+import pygame
+from support import convert_surface
+
+# draw order of everything the camera shows, back to front
+BG_PALM_LAYER = 0
+DUST_LAYER = 1
+TERRAIN_LAYER = 2
+ENEMY_LAYER = 3
+EXPLOSION_LAYER = 4
+CRATE_GRASS_LAYER = 5
+COIN_LAYER = 6
+FG_PALM_LAYER = 7
+PLAYER_LAYER = 8
+GOAL_LAYER = 9
+
+CHUNK_WIDTH = 1024
+
+def draw_visible(surface,sprites,camera_x):
+	"""Blits the sprites whose images overlap the camera window, shifted into screen space"""
+	# images can be larger than their rects, so cull by image width
+	right = camera_x + surface.get_width()
+	surface.blits([(sprite.image,(sprite.rect.x - camera_x,sprite.rect.y)) for sprite in sprites
+		if sprite.rect.x < right and sprite.rect.x + sprite.image.get_width() > camera_x],doreturn = False)
+
+class Chunk(pygame.sprite.Sprite):
+	def __init__(self,image,x,y):
+		super().__init__()
+		self.image = image
+		self.rect = image.get_rect(topleft = (x,y))
+
+def bake_chunks(groups,chunk_width = CHUNK_WIDTH):
+	"""Pre-composites static sprites, in group order, into chunk sprites chunk_width pixels wide"""
+	sprites = [sprite for group in groups for sprite in group]
+	if not sprites:
+		return []
+	left = min(sprite.rect.left for sprite in sprites) // chunk_width * chunk_width
+	right = max(sprite.rect.right for sprite in sprites)
+	top = min(sprite.rect.top for sprite in sprites)
+	height = max(sprite.rect.bottom for sprite in sprites) - top
+
+	chunks = []
+	for x in range(left,right,chunk_width):
+		area = pygame.Rect(x,top,chunk_width,height)
+		inside = [sprite for sprite in sprites if area.colliderect(sprite.rect)]
+		if not inside:
+			continue
+		image = pygame.Surface(area.size,flags = pygame.SRCALPHA)
+		image.blits([(sprite.image,(sprite.rect.x - x,sprite.rect.y - top)) for sprite in inside])
+		# chunks are mostly transparent and never written again, which is what run-length encoding is for
+		image = convert_surface(image)
+		image.set_alpha(255,pygame.RLEACCEL)
+		chunks.append(Chunk(image,x,top))
+	return chunks
+
+class CameraGroup(pygame.sprite.LayeredUpdates):
+	"""Ordered layers of world-space sprites, drawn through a camera that skips everything off screen"""
+	def draw(self,surface,camera_x = 0,layers = None):
+		sprites = self.sprites()
+		if layers is not None:
+			sprites = [sprite for sprite in sprites if self.get_layer_of_sprite(sprite) in layers]
+		draw_visible(surface,sprites,camera_x)
@@ -0,0 +1,42 @@
+from settings import tile_size
+
+class SpatialGrid:
+	"""Buckets sprites by the tile cells their rects overlap so queries only touch nearby sprites"""
+	def __init__(self,sprites = (),cell_size = tile_size):
+		self.cell_size = cell_size
+		self.cells = {}
+		self.order = {}
+		for sprite in sprites:
+			self.insert(sprite)
+
+	def cell_range(self,rect):
+		left = rect.left // self.cell_size
+		right = (rect.right - 1) // self.cell_size
+		top = rect.top // self.cell_size
+		bottom = (rect.bottom - 1) // self.cell_size
+		for col in range(left,right + 1):
+			for row in range(top,bottom + 1):
+				yield (col,row)
+
+	def insert(self,sprite):
+		# sprites are keyed by their rect at insertion time
+		self.order[sprite] = len(self.order)
+		for cell in self.cell_range(sprite.rect):
+			self.cells.setdefault(cell,[]).append(sprite)
+
+	def query(self,rect):
+		"""Returns the sprites sharing a cell with rect, in insertion order"""
+		found = set()
+		for cell in self.cell_range(rect):
+			found.update(self.cells.get(cell,()))
+		return sorted(found,key = self.order.__getitem__)
+
+class PairStats:
+	"""Counts broad-phase candidate pairs against the pairs that actually collided"""
+	def __init__(self):
+		self.counts = {}
+
+	def record(self,kind,candidates,hits):
+		counts = self.counts.setdefault(kind,{'candidates': 0,'hits': 0})
+		counts['candidates'] += candidates
+		counts['hits'] += hits
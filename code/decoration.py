@@ -1,14 +1,15 @@
 from settings import vertical_tile_number, tile_size, screen_width
 import pygame
 from tiles import AnimatedTile, StaticTile
-from support import import_folder
+from support import import_folder, import_image
 from random import choice, randint
+from camera import bake_chunks, draw_visible
 
 class Sky:
 	def __init__(self,horizon,style = 'level'):
-		self.top = pygame.image.load('../graphics/decoration/sky/sky_top.png').convert()
-		self.bottom = pygame.image.load('../graphics/decoration/sky/sky_bottom.png').convert()
-		self.middle = pygame.image.load('../graphics/decoration/sky/sky_middle.png').convert()
+		self.top = import_image('../graphics/decoration/sky/sky_top.png',alpha = False)
+		self.bottom = import_image('../graphics/decoration/sky/sky_bottom.png',alpha = False)
+		self.middle = import_image('../graphics/decoration/sky/sky_middle.png',alpha = False)
 		self.horizon = horizon
 
 		# stretch 
@@ -36,7 +37,11 @@ class Sky:
 				rect = surface.get_rect(midbottom = (x,y))
 				self.clouds.append((surface,rect))
 
-	def draw(self,surface):
+		# the sky never moves, so it is composed once and drawn with a single blit
+		self.surface = pygame.Surface((screen_width,vertical_tile_number * tile_size))
+		self.compose(self.surface)
+
+	def compose(self,surface):
 		for row in range(vertical_tile_number):
 			y = row * tile_size
 			if row < self.horizon:
@@ -52,6 +57,9 @@ class Sky:
 			for cloud in self.clouds:
 				surface.blit(cloud[0],cloud[1])
 
+	def draw(self,surface):
+		surface.blit(self.surface,(0,0))
+
 class Water:
 	def __init__(self,top,level_width):
 		water_start = -screen_width
@@ -65,9 +73,11 @@ class Water:
 			sprite = AnimatedTile(192,x,y,'../graphics/decoration/water')
 			self.water_sprites.add(sprite)
 
-	def draw(self,surface,shift):
-		self.water_sprites.update(shift)
-		self.water_sprites.draw(surface)
+	def update(self):
+		self.water_sprites.update()
+
+	def draw(self,surface,camera_x):
+		draw_visible(surface,self.water_sprites,camera_x)
 
 class Clouds:
 	def __init__(self,horizon,level_width,cloud_number):
@@ -83,8 +93,12 @@ class Clouds:
 			x = randint(min_x,max_x)
 			y = randint(min_y,max_y)
 			sprite = StaticTile(0,x,y,cloud)
+			sprite.rect = cloud.get_rect(topleft = (x,y))
 			self.cloud_sprites.add(sprite)
+		# baked on the first draw, headless levels never pay for it
+		self.chunks = None
 
-	def draw(self,surface,shift):
-		self.cloud_sprites.update(shift)
-		self.cloud_sprites.draw(surface)
+	def draw(self,surface,camera_x):
+		if self.chunks is None:
+			self.chunks = bake_chunks([self.cloud_sprites])
+		draw_visible(surface,self.chunks,camera_x)
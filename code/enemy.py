@@ -1,10 +1,11 @@
-import pygame 
 from tiles import AnimatedTile
+from support import import_folder_variant
 from random import randint
 
 class Enemy(AnimatedTile):
 	def __init__(self,size,x,y):
 		super().__init__(size,x,y,'../graphics/enemy/run')
+		self.flipped_frames = import_folder_variant('../graphics/enemy/run',flipped = True)
 		self.rect.y += size - self.image.get_size()[1]
 		self.speed = 4
 
@@ -13,13 +14,12 @@ class Enemy(AnimatedTile):
 
 	def reverse_image(self):
 		if self.speed > 0:
-			self.image = pygame.transform.flip(self.image,True,False)
+			self.image = self.flipped_frames[int(self.frame_index)]
 
 	def reverse(self):
 		self.speed *= -1
 
-	def update(self,shift):
-		self.rect.x += shift
+	def update(self):
 		self.animate()
 		self.move()
 		self.reverse_image()
\ No newline at end of file
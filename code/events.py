@@ -0,0 +1,55 @@
+import json
+import logging
+import sys
+from collections import deque
+from logging import DEBUG, INFO, WARNING
+
+__all__ = ["EventLog", "DEBUG", "INFO", "WARNING"]
+
+
+class EventLog:
+    """Structured game events kept in a fixed-size ring buffer, dumped on demand
+
+    Events less severe than level are dropped before anything is built, so hot paths guard with
+    wants(severity) and a disabled log costs one comparison. sample keeps only every n-th event of a kind, either one
+    n for all kinds or a {kind: n} dict. With echo, kept events are also passed to the "platformer" logger.
+    """
+
+    def __init__(self, level=WARNING, capacity=1024, sample=1, echo=False):
+        self.level = level
+        self.buffer = deque(maxlen=capacity)
+        self.sample = sample
+        self.echo = echo
+        self.counts = {}
+        self.logger = logging.getLogger("platformer")
+
+    def wants(self, severity):
+        return severity >= self.level
+
+    def event(self, severity, kind, **fields):
+        """Records a kind event with its fields if severity passes and it is the sampled one of its kind"""
+        if severity < self.level:
+            return
+        count = self.counts.get(kind, 0)
+        self.counts[kind] = count + 1
+        every = self.sample.get(kind, 1) if isinstance(self.sample, dict) else self.sample
+        if count % every:
+            return
+        self.buffer.append((count, severity, kind, fields))
+        if self.echo:
+            self.logger.log(severity, "%s %s", kind, fields)
+
+    def records(self, kind=None):
+        """Buffered events, oldest first, as dicts"""
+        return [dict(kind=event_kind, severity=logging.getLevelName(severity), seen=seen, **fields)
+                for seen, severity, event_kind, fields in self.buffer if kind is None or event_kind == kind]
+
+    def dump(self, file=None):
+        """Writes the buffered events to file (stdout by default) as JSON lines"""
+        file = file or sys.stdout
+        for record in self.records():
+            file.write(json.dumps(record, default=str) + "\n")
+
+    def clear(self):
+        self.buffer.clear()
+        self.counts.clear()
@@ -3,12 +3,18 @@ from gymnasium import spaces
 import numpy as np
 import pygame
 import sys
-from settings import tile_size, screen_width, screen_height, cur_level
+import struct
+import zlib
+from settings import screen_width, screen_height, cur_level
 from level import Level
 from player import Player
 from ui import UI
 from main import Game  # Import Game class
-import random
+from simulation import SimulationGame
+from level_compiler import load_level_bundle, playable_levels
+from observation import FrameStack, ObservationBuilder
+from geometry import FEATURES, GeometryIndex
+from events import EventLog, DEBUG, INFO
 
 # Register the environment
 gym.register(
@@ -17,57 +23,57 @@ gym.register(
     max_episode_steps=1000,
 )
 
-def extract_cell_positions(csv_file, set_1):
-    with open(csv_file, "r") as f:
-        lines = f.readlines()
-    
-    list_1 = []
-    
-    for row, line in enumerate(lines):
-        values = list(map(int, line.strip().split(",")))
-        for col, value in enumerate(values):
-            if value in set_1:
-                list_1.append((col*tile_size, 800 - row*tile_size))
-    
-    return list_1
-
-import csv
-
-def is_there_ground_below_it(csv_file: str, col_no: int, row_no: int) -> bool:
-    with open(csv_file, 'r') as file:
-        reader = list(csv.reader(file))  
-
-        
-        for i in range(row_no, len(reader)):
-            row = reader[i]
-            if col_no < len(row):
-                try:
-                    value = int(row[col_no])
-                    if value != -1:
-                        return 1  
-                except ValueError:
-                    continue  
-    return 0  
-
-
 class PlatformerEnv(gym.Env):
     """Custom Gymnasium Environment for Mario-like Platformer"""
 
     metadata = {"render_modes": ["human", "rgb_array"], "render_fps": 60}
 
-    def __init__(self, render_mode=None):
+    def __init__(self, render_mode=None, headless=None, backend="pygame", frame_skip=1, obs_pool=None,
+                 obs_channels=("terrain",), obs_features=False, events=None, levels=None, frame_stack=1):
+        """backend="numpy" trains on the array simulation, which has no pygame state to draw.
+
+        frame_skip repeats every action for that many game frames and sums their rewards; obs_pool
+        ("max" or "sum") pools the grids of those frames instead of returning only the last one.
+        obs_channels picks the grid channels, any of observation.CHANNELS in the order given.
+        obs_features adds a "features" vector of geometry.FEATURES: ground below the player, the next
+        pit, ledge edge and obstacle tiles, looked up in each level's geometry index.
+        events is the EventLog resets, positions and terminations are recorded in; the default one
+        only keeps warnings, so nothing is recorded or printed while training.
+        levels are the game_data levels episodes are drawn from, every playable one by default. All of
+        them are built once; reset(options={"level": k}) picks one, otherwise the seeded np_random does.
+        frame_stack > 1 stacks that many observations on their last axis, oldest first, like VecFrameStack,
+        from a preallocated ring buffer; every step returns fresh arrays that later steps leave alone.
+        """
         super(PlatformerEnv, self).__init__()
         
+        if backend not in ("pygame", "numpy"):
+            raise ValueError(f"unknown backend {backend!r}")
+        if backend == "numpy" and render_mode is not None:
+            raise ValueError("the numpy backend cannot render, use backend='pygame'")
+        if frame_skip < 1:
+            raise ValueError("frame_skip must be at least 1")
+        if frame_stack < 1:
+            raise ValueError("frame_stack must be at least 1")
+        if obs_pool not in (None, "max", "sum"):
+            raise ValueError(f"unknown obs_pool {obs_pool!r}")
+        self.backend = backend
+        self.events = events or EventLog()
+        self.frame_skip = frame_skip
+        self.obs_pool = obs_pool
         self.render_mode = render_mode
-        # cur_level = random.randint(0, 3)
-        self.terrain = None
-        self.csv_file = None
-        self.terrain = self._load_terrain(f"../levels/{cur_level}/level_{cur_level}_terrain.csv")
-        # Information for Edges Detection
-        self.csv_file = f"../levels/{cur_level}/level_{cur_level}_terrain.csv"
-        set_1 = {0, 2, 3, 12, 14}
-        self.list_1 = extract_cell_positions(self.csv_file, set_1)
-        self.list_1 = sorted(self.list_1, key=lambda item: item[0])
+        # Nothing is ever displayed without a render mode, so skip drawing and audio entirely
+        self.headless = render_mode is None if headless is None else headless
+        # observations index the per-level tables by each level's slot in self.levels
+        self.levels = tuple(playable_levels() if levels is None else levels)
+        self.level_slots = {level: slot for slot, level in enumerate(self.levels)}
+        bundles = [load_level_bundle(level) for level in self.levels]
+        self.observer = ObservationBuilder(bundles, obs_channels)
+        # Information for Edges Detection, indexed once per level
+        self.geometry = GeometryIndex(bundles)
+        self.obs_features = obs_features
+        self.level_index = cur_level if cur_level in self.level_slots else self.levels[0]
+        self.level_slot = self.level_slots[self.level_index]
+        self.level_episodes = [0] * len(self.levels)
 
         # Define action space (0 = Left, 1 = Right, 2 = Jump, 3 = No action)
         self.action_space = spaces.Discrete(4)
@@ -77,19 +83,37 @@ class PlatformerEnv(gym.Env):
         #     low=-np.inf, high=np.inf, shape=(10,), dtype=np.float32
         # )
 
+        # summed grids count how many of the repeated frames saw a platform in each cell
+        grid_high = frame_skip if obs_pool == "sum" else 1
         self.observation_space = spaces.Dict({
-            "grid": spaces.Box(low=0, high=1, shape=(15, 11, 1), dtype=np.float32)
+            "grid": spaces.Box(low=0, high=grid_high, shape=self.observer.shape, dtype=np.float32)
         })
-
-        # Initialize pygame only once
-        if not pygame.get_init():
+        if obs_features:
+            self.observation_space["features"] = spaces.Box(low=-np.inf, high=np.inf, shape=(len(FEATURES),),
+                                                            dtype=np.float32)
+        self.frame_stack = frame_stack
+        self.stack = None
+        if frame_stack > 1:
+            self.stack = FrameStack(self.observation_space, frame_stack)
+            self.observation_space = self.stack.space
+
+        # Initialize pygame only once, and only for envs that draw or play sound: a headless env runs on plain
+        # Surfaces and the frame clock, and leaves the SDL drivers to whatever env in the process opens a window
+        if not self.headless and not pygame.get_init():
             pygame.init()
+        # only a human-rendered env is heard; the others share the process with it and stay silent
+        self.muted = render_mode != "human"
+        if not self.muted and not pygame.mixer.get_init():
             pygame.mixer.init()  # Initialize the mixer for audio
 
-        # Set up screen if rendering
+        # Set up screen if rendering; the window is the only display state an env touches
         if self.render_mode == "human":
             self.screen = pygame.display.set_mode((screen_width, screen_height))
             self.clock = pygame.time.Clock()
+        elif self.render_mode == "rgb_array":
+            # frames are drawn offscreen and returned as arrays
+            self.screen = pygame.Surface((screen_width, screen_height))
+            self.clock = None
         else:
             self.screen = None
             self.clock = None
@@ -99,39 +123,36 @@ class PlatformerEnv(gym.Env):
         self.player_y = 0
         self.previous_x = 0
         self.total_reward = 0
-
-    def _load_terrain(self, filepath):
-        """Load terrain CSV into 2D numpy array"""
-        with open(filepath, 'r') as f:
-            reader = csv.reader(f)
-            return np.array([[int(col) for col in row] for row in reader])
+        self.termination_cause = None
 
     def reset(self, seed=None, options=None):
         """Reset game state at the start of each episode"""
         super().reset(seed=seed)
         
-        # Reset the game state
-        if self.render_mode == "human":
-            self.screen = pygame.display.set_mode((screen_width, screen_height))
-        
-        self.game = Game(external_screen=self.screen)
-        player = self.game.level.player.sprites()[0]
-        cur_level = random.randint(0, 3)
-        self.csv_file = f"../levels/{cur_level}/level_{cur_level}_terrain.csv"
-        self.terrain = self._load_terrain(self.csv_file)
-        print(f"Resetting to level {cur_level}")
-        # Reset player physics and state
-        player.velocity_x = 0
-        player.velocity_y = 0
-        player.previous_pos = (player.rect.x, player.rect.y)
-        player.on_ground = False
-        player.on_left = False
-        player.on_right = False
-        player.on_ceiling = False
-        
-        # Force initial collision check
-        self.game.level.vertical_movement_collision()
-        self.game.level.horizontal_movement_collision()
+        options = options or {}
+        if "level" in options:
+            cur_level = options["level"]
+            if cur_level not in self.level_slots:
+                raise ValueError(f"level {cur_level!r} is not one of {self.levels}")
+        else:
+            cur_level = self.levels[self.np_random.integers(len(self.levels))]
+
+        # Build the game with every level once; switching then only restores the chosen one
+        if self.game is None:
+            if self.backend == "numpy":
+                self.game = SimulationGame(level=cur_level, preload=self.levels)
+            else:
+                # frame-clocked like the simulation, so episodes replay exactly from their actions
+                self.game = Game(external_screen=self.screen, headless=self.headless, events=self.events,
+                                 muted=self.muted, level=cur_level, preload=self.levels, frame_clock=True)
+        self.game.select_level(cur_level)
+        # the played level and the observed terrain always agree
+        self.level_index = cur_level
+        self.level_slot = self.level_slots[cur_level]
+        self.level_episodes[self.level_slot] += 1
+        self.events.event(INFO, "reset", level=cur_level)
+        # Reset player physics and force an initial collision check
+        self.game.begin_episode()
         
         # Get initial player position
         player_position = self.game.level.get_position()
@@ -145,8 +166,22 @@ class PlatformerEnv(gym.Env):
 
         # Calculate nearest obstacles
         observation = self._get_obs()
+        if self.stack is not None:
+            observation = self.stack.reset(observation)
         
-        return observation, {}
+        return observation, self._info()
+
+    def state_checksum(self):
+        """CRC32 of the player's position, motion, health and coins, equal across backends for equal states"""
+        level = self.game.level
+        player_state = level.get_player_state()
+        values = (*level.get_position(), *player_state['velocity'], player_state['on_ground'],
+                  level.check_on_ground(), self.game.cur_health, self.game.coins)
+        return zlib.crc32(struct.pack(f"<{len(values)}q", *(int(value) for value in values)))
+
+    def _info(self):
+        """The level being played and how many episodes each level has started"""
+        return {"level": self.level_index, "level_episodes": dict(zip(self.levels, self.level_episodes))}
 
 
     def _get_obs(self):
@@ -155,74 +190,68 @@ class PlatformerEnv(gym.Env):
         player_state = self.game.level.get_player_state()
         collision_info = self.game.level.check_on_ground()
         ################################### SECOND APPROACH #####################################
-        grid_x = int(player_position[0] / tile_size)
-        grid_y = len(self.terrain) - 1 - int(player_position[1] / tile_size)
-
-        obs_grid = np.zeros((15, 11), dtype=np.float32)
+        # Grid window around the player, sliced from pre-padded level layers
+        enemies = coins = None
+        if self.observer.uses_entities:
+            enemies = self.game.level.get_enemy_centres()
+            coins = self.game.level.get_coin_centres()
+        obs_grid = self.observer.observe(self.level_slot, player_position[0], player_position[1], enemies, coins)
+
+        if self.events.wants(DEBUG):
+            goal = self.game.level.get_position_of_start_and_goal()
+            self.events.event(DEBUG, "position", level=self.level_index, x=player_position[0], y=player_position[1],
+                              goal_x=goal['goal'][0], goal_y=goal['goal'][1])
+        observation = {"grid": obs_grid}
+        if self.obs_features:
+            # pits, ledge edges and obstacles ahead, looked up by bisect instead of rescanning the terrain
+            observation["features"] = self.geometry.features(self.level_slot, player_position[0], player_position[1])
+        return observation
 
-        for dy in range(-5, 10):
-            for dx in range(-1, 10):
-                level_x = grid_x + dx
-                level_y = grid_y + dy
-                
-                if 0 <= level_x < len(self.terrain[0]) and 0 <= level_y < len(self.terrain):
-                    if self.terrain[level_y][level_x] != -1:  # Platform exists
-                        obs_grid[dy+5, dx+1] = 1.0  # Normalized to 1.0
+    def step(self, action):
+        """Apply action for frame_skip frames and update game state"""
+        reward = 0
+        terminated = False
+        truncated = False
+        pooled_grid = None
+
+        for _ in range(self.frame_skip):
+            frame_reward, terminated = self._run_frame(action)
+            reward += frame_reward
+            if self.obs_pool is not None:
+                frame_obs = self._get_obs()
+                pooled_grid = self._pool_grid(pooled_grid, frame_obs["grid"])
+            # Falling in the water or reaching the goal ends the repeat early
+            if terminated:
+                break
 
-        # # Calculate relative positions of obstacles
-        # result1 = [(a - player_position[0], b - player_position[1]) for a, b in self.list_1]
+        self.total_reward += reward
+        if terminated:
+            self.events.event(INFO, "terminated", cause=self.termination_cause, level=self.level_index,
+                              x=self.player_x, y=self.player_y, reward=reward, total_reward=self.total_reward)
+        # Get observation
+        observation = self._get_obs() if pooled_grid is None else dict(frame_obs, grid=pooled_grid)
+        if self.stack is not None:
+            observation = self.stack.push(observation)
         
-        # # Find two nearest obstacles to the right
-        # nearest_1 = (0, 0)
-        # nearest_2 = (0, 0)
-        # dist_1 = float('inf')
-        # dist_2 = float('inf')
-
-        # for (dx, dy), (orig_x, orig_y) in zip(result1, self.list_1):
-        #     if orig_x > player_position[0]:  # Only consider obstacles to the right
-        #         distance = dx**2 + dy**2
-        #         if distance < dist_1:
-        #             nearest_2 = nearest_1
-        #             dist_2 = dist_1
-        #             nearest_1 = (dx, orig_y - player_position[1])
-        #             dist_1 = distance
-        #         elif distance < dist_2:
-        #             nearest_2 = (dx, orig_y - player_position[1])
-        #             dist_2 = distance
-
-        # is_there_ground_or_not = 1
-        # # Is there a ground or not below it or not
-        # round_off_x = int(player_position[0]/64)
-        # round_off_y = int(player_position[1]/64)
-
-        # is_there_ground_or_not = is_there_ground_below_it(self.csv_file,round_off_x,round_off_y)
-
-        goal = self.game.level.get_position_of_start_and_goal()
-        print(f"{player_position[0]} {player_position[1]} {goal['goal'][0]} {goal['goal'][1]}")
-        # print(obs_grid)
-        # return np.array([
-        #     player_position[0], player_position[1],           # Position (x, y)
-        #     player_position[0]-self.previous_x, player_state['velocity'][1],  # Velocity (vx, vy)
-        #     int(collision_info),
-        #     is_there_ground_or_not,                              # Grounded status
-        #     nearest_1[0], nearest_1[1],                      # Next obstacle 1
-        #     nearest_2[0], nearest_2[1]                       # Next obstacle 2
-        # ], dtype=np.float32)
-        obs_grid = np.expand_dims(obs_grid, axis=-1)  # shape (15, 11, 1)
+        # Render if needed
+        if self.render_mode == "human":
+            self.render()
+        
+        return observation, reward, terminated, truncated, self._info()
 
-        return {
-            "grid": obs_grid,
-        }
+    def _pool_grid(self, pooled, grid):
+        if pooled is None:
+            return grid
+        if self.obs_pool == "max":
+            return np.maximum(pooled, grid)
+        return pooled + grid
 
-    def step(self, action):
-        """Apply action and update game state"""
+    def _run_frame(self, action):
+        """Run one game frame with action and return its reward and whether the episode ended"""
         previous_x = self.player_x
         
-        # Apply action
-        self.game.level.player.sprites()[0].get_input(action)
-        
-        # Run game logic
-        self.game.run()
+        # Apply action and run game logic
+        self.game.step(action)
         
         # Get updated state
         player_position = self.game.level.get_position()
@@ -233,7 +262,6 @@ class PlatformerEnv(gym.Env):
         # Calculate reward and done flag
         reward = 0
         terminated = False
-        truncated = False
         
         # 1. Progress reward
         progress = (self.player_x - previous_x) / 10.0
@@ -258,25 +286,17 @@ class PlatformerEnv(gym.Env):
         # 5. Big penalty for falling in water
         if self.player_y > 700:
             reward -= 20
-            print("Fell Into Water!!")
+            self.termination_cause = "water"
             terminated = True
         
         # 6. Reward for completing level
         if self.player_x >= positions["goal"][0]:
             reward += 100
-            print("Level Completed {cur_level} !!!")
+            self.termination_cause = "goal"
             terminated = True
         
-        self.total_reward += reward
         self.previous_x = self.player_x
-        # Get observation
-        observation = self._get_obs()
-        
-        # Render if needed
-        if self.render_mode == "human":
-            self.render()
-        
-        return observation, reward, terminated, truncated, {}
+        return reward, terminated
 
     def render_observation(self, obs=None):
         """Debug visualization of the agent's observation"""
@@ -308,18 +328,22 @@ class PlatformerEnv(gym.Env):
     def render(self):
         """Render the environment"""
         if self.render_mode == "human":
-            self.screen.fill('grey')
-            self.game.run()
+            # step already advanced the game, rendering only draws the current frame over the whole screen
+            self.game.draw(self.screen)
             pygame.display.update()
             self.clock.tick(self.metadata["render_fps"])
         elif self.render_mode == "rgb_array":
-            # Return RGB array for video recording
-            return pygame.surfarray.array3d(self.screen)
+            # Return an (height, width, 3) RGB array for video recording, copied out in one call
+            self.game.draw(self.screen)
+            frame = pygame.image.tobytes(self.screen, "RGB")
+            return np.frombuffer(frame, dtype=np.uint8).reshape(screen_height, screen_width, 3)
 
     def close(self):
         """Close the environment"""
-        if self.screen is not None:
-            pygame.quit()
+        # other envs of the process keep using pygame and the shared assets, so only the window is closed
+        if self.render_mode == "human":
+            pygame.display.quit()
+        self.screen = None
 
 
 # At the bottom of game_env.py (after the PlatformerEnv class definition)
@@ -0,0 +1,164 @@
+from bisect import bisect_right
+
+import numpy as np
+
+from settings import tile_size, screen_width
+
+# terrain tile ids of the top edges and corners of platforms, the obstacles of the old vector observation
+OBSTACLE_TILES = (0, 2, 3, 12, 14)
+# value of a distance feature when there is nothing ahead, about a screen away
+FAR = float(screen_width)
+FEATURES = ("ground_below", "drop", "gap_dx", "gap_width", "edge_dx",
+            "obstacle1_dx", "obstacle1_dy", "obstacle2_dx", "obstacle2_dy")
+
+
+class LevelGeometry:
+    """Terrain of one level indexed once for O(1) and O(log n) lookups
+
+    Coordinates are world pixels with y growing downwards, like the sprites: row r of the terrain layer
+    spans y in [r * tile_size, (r + 1) * tile_size).
+    """
+
+    def __init__(self, bundle):
+        terrain = bundle.layer('terrain') != -1
+        self.height, self.width = terrain.shape
+        rows = np.arange(self.height)[:, None]
+
+        # ground[row, col]: first terrain row at or below row in col, -1 when the column is empty from there down
+        ground = np.where(terrain, rows, self.height)
+        ground = np.minimum.accumulate(ground[::-1], axis=0)[::-1]
+        ground = np.vstack([ground, np.full((1, self.width), self.height)])
+        self.ground = np.where(ground == self.height, -1, ground)
+        # surface row of every column, -1 over pits
+        self.surface = self.ground[0]
+
+        # pits are runs of columns without any terrain, stored as sorted [start_x, end_x) spans
+        empty = np.concatenate([[False], self.surface == -1, [False]])
+        changes = np.flatnonzero(empty[1:] != empty[:-1])
+        self.gap_start = changes[0::2] * tile_size
+        self.gap_end = changes[1::2] * tile_size
+
+        # ledge edges sit between neighbouring columns whose surfaces differ, pits included
+        edges = np.flatnonzero(self.surface[1:] != self.surface[:-1]) + 1
+        self.edge_x = edges * tile_size
+
+        # obstacle tiles sorted by x, then y
+        cells = np.isin(bundle.layer('terrain'), OBSTACLE_TILES)
+        obstacle_cols, obstacle_rows = np.nonzero(cells.T)
+        self.obstacle_x = obstacle_cols * tile_size
+        self.obstacle_y = obstacle_rows * tile_size
+
+        # plain lists for bisect
+        self._gap_start = self.gap_start.tolist()
+        self._edge_x = self.edge_x.tolist()
+        self._obstacle_x = self.obstacle_x.tolist()
+
+    def _cell(self, x, y):
+        return min(max(int(x / tile_size), 0), self.width - 1), min(max(int(y / tile_size), 0), self.height)
+
+    def ground_below(self, x, y):
+        """Top y of the first terrain cell at or below (x, y), None if the column is open down to the water"""
+        col, row = self._cell(x, y)
+        ground_row = int(self.ground[row, col])
+        return None if ground_row == -1 else ground_row * tile_size
+
+    def next_gap(self, x):
+        """(start_x, end_x) of the first pit ending to the right of x, None if there is none"""
+        index = bisect_right(self._gap_start, x)
+        # a pit starting at or before x may still be under the player
+        if index and self.gap_end[index - 1] > x:
+            index -= 1
+        if index == len(self._gap_start):
+            return None
+        return int(self.gap_start[index]), int(self.gap_end[index])
+
+    def next_edge(self, x):
+        """x of the first ledge edge to the right of x, None if there is none"""
+        index = bisect_right(self._edge_x, x)
+        return None if index == len(self._edge_x) else int(self.edge_x[index])
+
+    def next_obstacles(self, x, count=2):
+        """Up to count obstacle tiles to the right of x, nearest first, as (x, y) pairs"""
+        index = bisect_right(self._obstacle_x, x)
+        return list(zip(self._obstacle_x[index:index + count], self.obstacle_y[index:index + count].tolist()))
+
+    def features(self, x, y):
+        """The FEATURES of a player at (x, y) as a float32 vector, distances in pixels relative to the player"""
+        ground = self.ground_below(x, y)
+        gap = self.next_gap(x)
+        edge = self.next_edge(x)
+        vector = [
+            float(ground is not None),
+            FAR if ground is None else ground - y,
+            FAR if gap is None else max(gap[0] - x, 0),
+            0.0 if gap is None else gap[1] - gap[0],
+            FAR if edge is None else edge - x,
+        ]
+        obstacles = self.next_obstacles(x)
+        for obstacle_x, obstacle_y in obstacles:
+            vector += [obstacle_x - x, obstacle_y - y]
+        vector += [FAR, 0.0] * (2 - len(obstacles))
+        return np.array(vector, dtype=np.float32)
+
+
+class GeometryIndex:
+    """LevelGeometry of several levels, with their sorted tables concatenated for batched lookups
+
+    Keys are offset by level * stride so one np.searchsorted call serves players spread over every level.
+    """
+
+    def __init__(self, bundles):
+        self.levels = [LevelGeometry(bundle) for bundle in bundles]
+        self.widths = np.array([geometry.width for geometry in self.levels])
+        self.heights = np.array([geometry.height for geometry in self.levels])
+        self.stride = (int(self.widths.max()) + 1) * tile_size
+        self.ground = np.full((len(self.levels), self.heights.max() + 1, self.widths.max()), -1, dtype=np.int64)
+        for index, geometry in enumerate(self.levels):
+            self.ground[index, :geometry.height + 1, :geometry.width] = geometry.ground
+
+        self.tables = {}
+        for name, columns in (("gap", ("gap_start", "gap_end")), ("edge", ("edge_x",)), ("obstacle", ("obstacle_x", "obstacle_y"))):
+            counts = [len(getattr(geometry, columns[0])) for geometry in self.levels]
+            ends = np.cumsum(counts)
+            keys = np.concatenate([getattr(geometry, columns[0]) + index * self.stride
+                                   for index, geometry in enumerate(self.levels)])
+            # one unused slot at the end keeps every searchsorted result a valid index
+            values = [np.append(np.concatenate([getattr(geometry, column) for geometry in self.levels]), 0)
+                      for column in columns]
+            self.tables[name] = (keys, ends - counts, ends, values)
+
+    def features(self, level, x, y):
+        return self.levels[level].features(x, y)
+
+    def features_batch(self, level, x, y):
+        """features for many players at once, returns (N, len(FEATURES))"""
+        col = np.clip((x / tile_size).astype(np.int64), 0, self.widths[level] - 1)
+        row = np.clip((y / tile_size).astype(np.int64), 0, self.heights[level])
+        ground_row = self.ground[level, row, col]
+        has_ground = ground_row != -1
+        vector = np.empty((len(x), len(FEATURES)), dtype=np.float32)
+        vector[:, 0] = has_ground
+        vector[:, 1] = np.where(has_ground, ground_row * tile_size - y, FAR)
+        # bisect_right treats every x left of a level alike, so clamp keys there to stay inside the level's range
+        key = level * self.stride + np.maximum(x, -1)
+
+        keys, starts, ends, (gap_start, gap_end) = self.tables["gap"]
+        gap = np.searchsorted(keys, key, side='right')
+        # step back onto a pit that is still under the player
+        gap -= (gap > starts[level]) & (gap_end[gap - 1] > x)
+        found = gap < ends[level]
+        vector[:, 2] = np.where(found, np.maximum(gap_start[gap] - x, 0), FAR)
+        vector[:, 3] = np.where(found, gap_end[gap] - gap_start[gap], 0.0)
+
+        keys, starts, ends, (edge_x,) = self.tables["edge"]
+        edge = np.searchsorted(keys, key, side='right')
+        vector[:, 4] = np.where(edge < ends[level], edge_x[edge] - x, FAR)
+
+        keys, starts, ends, (obstacle_x, obstacle_y) = self.tables["obstacle"]
+        first = np.searchsorted(keys, key, side='right')
+        for slot in range(2):
+            index = np.minimum(first + slot, len(keys))
+            found = index < ends[level]
+            vector[:, 5 + 2 * slot] = np.where(found, obstacle_x[index] - x, FAR)
+            vector[:, 6 + 2 * slot] = np.where(found, obstacle_y[index] - y, 0.0)
+        return vector
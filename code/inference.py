@@ -0,0 +1,146 @@
+import queue
+import threading
+import time
+from collections import Counter, deque
+
+import numpy as np
+
+
+class _Request:
+    __slots__ = ("obs", "submitted", "done", "action", "error")
+
+    def __init__(self, obs):
+        self.obs = obs
+        self.submitted = time.perf_counter()
+        self.done = threading.Event()
+        self.action = None
+        self.error = None
+
+
+class InferenceServer:
+    """Answers predict calls from many threads with batched forward passes of one policy
+
+    A serving thread takes the first waiting observation and keeps gathering until max_batch are waiting
+    or deadline seconds have passed since that first one arrived, then runs them through model.predict
+    as one batch and hands every caller its action. A lone caller therefore waits at most about deadline
+    longer than a direct predict. The last latency_window action latencies are kept for stats().
+    """
+
+    def __init__(self, model, max_batch=64, deadline=0.002, deterministic=True, latency_window=100_000):
+        self.model = model
+        self.max_batch = max_batch
+        self.deadline = deadline
+        self.deterministic = deterministic
+        self.requests = queue.SimpleQueue()
+        self.batch_sizes = Counter()
+        self.latencies = deque(maxlen=latency_window)
+        self.thread = threading.Thread(target=self._serve, name="inference", daemon=True)
+        self.thread.start()
+
+    def predict(self, obs):
+        """The action for one unbatched observation, blocking until its batch has run"""
+        request = _Request(obs)
+        self.requests.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.action
+
+    def _serve(self):
+        while True:
+            first = self.requests.get()
+            if first is None:
+                return
+            batch = [first]
+            closes = first.submitted + self.deadline
+            stopping = False
+            while len(batch) < self.max_batch:
+                timeout = closes - time.perf_counter()
+                try:
+                    request = self.requests.get(timeout=timeout) if timeout > 0 else self.requests.get_nowait()
+                except queue.Empty:
+                    break
+                if request is None:
+                    stopping = True
+                    break
+                batch.append(request)
+            self._run(batch)
+            if stopping:
+                return
+
+    def _run(self, batch):
+        try:
+            obs = {key: np.stack([request.obs[key] for request in batch]) for key in batch[0].obs}
+            actions, _ = self.model.predict(obs, deterministic=self.deterministic)
+        except Exception as error:
+            for request in batch:
+                request.error = error
+                request.done.set()
+            return
+        done = time.perf_counter()
+        self.batch_sizes[len(batch)] += 1
+        for request, action in zip(batch, actions.tolist()):
+            request.action = action
+            self.latencies.append(done - request.submitted)
+            request.done.set()
+
+    def stats(self):
+        """Batch size distribution as {size: batches}, mean batch size and p50/p99 action latency in ms"""
+        batches = sum(self.batch_sizes.values())
+        latencies = np.array(self.latencies) * 1e3
+        return {
+            "batches": batches,
+            "batch_sizes": dict(sorted(self.batch_sizes.items())),
+            "mean_batch": sum(size * count for size, count in self.batch_sizes.items()) / batches if batches else 0.0,
+            "p50_ms": float(np.percentile(latencies, 50)) if len(latencies) else float("nan"),
+            "p99_ms": float(np.percentile(latencies, 99)) if len(latencies) else float("nan"),
+        }
+
+    def close(self):
+        """Stops the serving thread once the requests already waiting are answered"""
+        if self.thread.is_alive():
+            self.requests.put(None)
+            self.thread.join()
+
+
+def run_fleet(model, instances, steps=1000, env_kwargs=None, max_batch=None, deadline=0.002, seed=0):
+    """Plays instances headless CustomPlatformer-v0 envs, one thread each, for steps actions apiece through one server
+
+    The envs keep the registered 1000 step time limit and repeat each action for the frame_skip saved with the
+    model unless env_kwargs says otherwise. Returns (episodes finished, seconds taken, server stats); building
+    the envs is not timed.
+    """
+    import gymnasium as gym
+    import game_env  # registers CustomPlatformer-v0
+
+    env_kwargs = {"frame_skip": getattr(model, "frame_skip", 1), **(env_kwargs or {})}
+    envs = [gym.make("CustomPlatformer-v0", render_mode=None, **env_kwargs) for _ in range(instances)]
+    server = InferenceServer(model, max_batch=max_batch or instances, deadline=deadline)
+    episodes = [0] * instances
+    errors = []
+
+    def play(index):
+        env = envs[index]
+        try:
+            obs, _ = env.reset(seed=seed + index)
+            for _ in range(steps):
+                obs, _, terminated, truncated, _ = env.step(server.predict(obs))
+                if terminated or truncated:
+                    episodes[index] += 1
+                    obs, _ = env.reset()
+        except Exception as error:
+            errors.append(error)
+        finally:
+            env.close()
+
+    threads = [threading.Thread(target=play, args=(index,), name=f"env-{index}") for index in range(instances)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    server.close()
+    if errors:
+        raise errors[0]
+    return sum(episodes), elapsed, server.stats()
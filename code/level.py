@@ -1,38 +1,48 @@
 import pygame 
-from support import import_csv_layout, import_cut_graphics
+import numpy as np
+from support import import_cut_graphics, import_image, import_sound
 from settings import tile_size, screen_height, screen_width, control_ai
 from tiles import Tile, StaticTile, Crate, Coin, Palm
 from enemy import Enemy
 from decoration import Sky, Water, Clouds
 from player import Player
-from particles import ParticleEffect
+from particles import ParticlePool
 from game_data import levels
+from level_compiler import load_level_bundle
+from collision import SpatialGrid, PairStats
+from events import EventLog, DEBUG
+from camera import CameraGroup, bake_chunks, BG_PALM_LAYER, DUST_LAYER, TERRAIN_LAYER, ENEMY_LAYER, EXPLOSION_LAYER, CRATE_GRASS_LAYER, COIN_LAYER, FG_PALM_LAYER, PLAYER_LAYER, GOAL_LAYER
 import sys
 
 class Level:
-	def __init__(self,current_level,surface,change_coins,change_health):
+	def __init__(self,current_level,surface,change_coins,change_health,headless = False,bundle = None,events = None,muted = None):
 
 		# general setup
 		self.display_surface = surface
+		self.headless = headless
+		self.events = events or EventLog()
+		# every sprite lives in world coordinates; the camera only offsets drawing
+		self.camera_x = 0
 		self.world_shift = 0
-		self.total_shift = 0
 		self.current_x = None
 
 		# audio 
-		self.coin_sound = pygame.mixer.Sound('../audio/effects/coin.wav')
-		self.stomp_sound = pygame.mixer.Sound('../audio/effects/stomp.wav')
+		# offscreen games draw but stay silent, the mixer is shared by the whole process
+		self.muted = headless if muted is None else muted
+		self.coin_sound = import_sound('../audio/effects/coin.wav',muted = self.muted)
+		self.stomp_sound = import_sound('../audio/effects/stomp.wav',muted = self.muted)
 
 		# overworld connection 
 		# self.create_overworld = create_overworld
 		self.current_level = current_level
 		level_data = levels[self.current_level]
 		self.new_max_level = level_data['unlock']
+		bundle = bundle or load_level_bundle(self.current_level)
 
 		# player 
-		player_layout = import_csv_layout(level_data['player'])
 		self.player = pygame.sprite.GroupSingle()
 		self.goal = pygame.sprite.GroupSingle()
-		self.player_setup(player_layout,change_health)
+		self.player_setup(bundle.start,bundle.goal,change_health)
 		
 
 		# Now that player is set up, initialize AI
@@ -50,44 +60,121 @@ class Level:
 		# explosion particles 
 		self.explosion_sprites = pygame.sprite.Group()
 
+		# dust and explosions reuse pooled effects, none are spawned headless
+		self.particles = ParticlePool(headless = headless)
+
 		# terrain setup
-		terrain_layout = import_csv_layout(level_data['terrain'])
-		self.terrain_sprites = self.create_tile_group(terrain_layout,'terrain')
+		self.terrain_sprites = self.create_tile_group(bundle.layer('terrain'),'terrain')
 
 		# grass setup 
-		grass_layout = import_csv_layout(level_data['grass'])
-		self.grass_sprites = self.create_tile_group(grass_layout,'grass')
+		self.grass_sprites = self.create_tile_group(bundle.layer('grass'),'grass')
 
 		# crates 
-		crate_layout = import_csv_layout(level_data['crates'])
-		self.crate_sprites = self.create_tile_group(crate_layout,'crates')
+		self.crate_sprites = self.create_tile_group(bundle.layer('crates'),'crates')
 
 		# coins 
-		coin_layout = import_csv_layout(level_data['coins'])
-		self.coin_sprites = self.create_tile_group(coin_layout,'coins')
+		self.coin_sprites = self.create_tile_group(bundle.layer('coins'),'coins')
 
 		# foreground palms 
-		fg_palm_layout = import_csv_layout(level_data['fg palms'])
-		self.fg_palm_sprites = self.create_tile_group(fg_palm_layout,'fg palms')
+		self.fg_palm_sprites = self.create_tile_group(bundle.layer('fg palms'),'fg palms')
 
 		# background palms 
-		bg_palm_layout = import_csv_layout(level_data['bg palms'])
-		self.bg_palm_sprites = self.create_tile_group(bg_palm_layout,'bg palms')
+		self.bg_palm_sprites = self.create_tile_group(bundle.layer('bg palms'),'bg palms')
 
 		# enemy 
-		enemy_layout = import_csv_layout(level_data['enemies'])
-		self.enemy_sprites = self.create_tile_group(enemy_layout,'enemies')
+		self.enemy_sprites = self.create_tile_group(bundle.layer('enemies'),'enemies')
 
 		# constraint 
-		constraint_layout = import_csv_layout(level_data['constraints'])
-		self.constraint_sprites = self.create_tile_group(constraint_layout,'constraint')
+		self.constraint_sprites = self.create_tile_group(bundle.layer('constraints'),'constraint')
+
+		# static collision index over everything the player can stand on or bump into
+		self.collision_grid = SpatialGrid(self.terrain_sprites.sprites() + self.crate_sprites.sprites() + self.fg_palm_sprites.sprites())
+
+		# broad-phase for coins, enemies and constraints; enemies move so theirs is rebuilt every frame
+		self.coin_grid = SpatialGrid(self.coin_sprites)
+		self.constraint_grid = SpatialGrid(self.constraint_sprites)
+		self.enemy_grid = SpatialGrid(self.enemy_sprites)
+		self.pair_stats = PairStats()
 
 		# decoration 
 		self.sky = Sky(8)
-		level_width = len(terrain_layout[0]) * tile_size
+		level_width = bundle.width * tile_size
 		self.water = Water(screen_height - 20,level_width)
 		self.clouds = Clouds(400,level_width,30)
 
+		# terrain, crates and grass never change, so they are drawn from chunks baked once
+		if not self.headless:
+			self.terrain_chunks = bake_chunks([self.terrain_sprites])
+			self.crate_grass_chunks = bake_chunks([self.crate_sprites,self.grass_sprites])
+			self.visible_sprites = self.create_visible_sprites()
+
+		self.save_template()
+
+	def create_visible_sprites(self):
+		"""Collects everything the camera draws into one group, layered in draw order"""
+		visible_sprites = CameraGroup()
+		layers = (
+			(BG_PALM_LAYER,self.bg_palm_sprites),
+			(DUST_LAYER,self.dust_sprite),
+			(TERRAIN_LAYER,self.terrain_chunks),
+			(ENEMY_LAYER,self.enemy_sprites),
+			(EXPLOSION_LAYER,self.explosion_sprites),
+			(CRATE_GRASS_LAYER,self.crate_grass_chunks),
+			(COIN_LAYER,self.coin_sprites),
+			(FG_PALM_LAYER,self.fg_palm_sprites),
+			(PLAYER_LAYER,self.player),
+			(GOAL_LAYER,self.goal))
+		for layer, sprites in layers:
+			visible_sprites.add(*sprites,layer = layer)
+		return visible_sprites
+
+	def show(self,sprite,layer):
+		if not self.headless:
+			self.visible_sprites.add(sprite,layer = layer)
+
+	def add_dust(self,sprite):
+		if sprite is None:
+			return
+		# the dust group holds a single effect, a new one replaces the last on screen too
+		if not self.headless:
+			self.visible_sprites.remove(*self.dust_sprite)
+		self.dust_sprite.add(sprite)
+		self.show(sprite,DUST_LAYER)
+
+	def save_template(self):
+		"""Remembers the pristine state of everything a level run can change"""
+		self.coin_template = self.coin_sprites.sprites()
+		self.enemy_template = [(enemy,enemy.rect.copy(),enemy.speed) for enemy in self.enemy_sprites]
+
+	def reset(self):
+		"""Restores the pristine level state in place instead of rebuilding the level"""
+		self.camera_x = 0
+		self.world_shift = 0
+		self.current_x = None
+		self.on_ground = False
+		self.player_on_ground = False
+
+		self.player.sprite.reset(self.player_start_pos)
+		self.dust_sprite.empty()
+		self.explosion_sprites.empty()
+
+		self.coin_sprites.empty()
+		for coin in self.coin_template:
+			coin.frame_index = 0
+			coin.image = coin.frames[0]
+			self.coin_sprites.add(coin)
+
+		self.enemy_sprites.empty()
+		for enemy, rect, speed in self.enemy_template:
+			enemy.rect = rect.copy()
+			enemy.speed = speed
+			enemy.frame_index = 0
+			enemy.image = enemy.frames[0]
+			self.enemy_sprites.add(enemy)
+		self.enemy_grid = SpatialGrid(self.enemy_sprites)
+		if not self.headless:
+			self.visible_sprites = self.create_visible_sprites()
+
 
 	def change_coins(self, amount):
 		self.coins += amount
@@ -97,85 +184,84 @@ class Level:
 		
 	def create_tile_group(self,layout,type):
 		sprite_group = pygame.sprite.Group()
+		terrain_tile_list = import_cut_graphics('../graphics/terrain/terrain_tiles.png')
+		grass_tile_list = import_cut_graphics('../graphics/decoration/grass/grass.png')
+
+		for row_index, col_index in zip(*np.nonzero(layout != -1)):
+			val = int(layout[row_index,col_index])
+			x = int(col_index) * tile_size
+			y = int(row_index) * tile_size
 
-		for row_index, row in enumerate(layout):
-			for col_index,val in enumerate(row):
-				if val != '-1':
-					x = col_index * tile_size
-					y = row_index * tile_size
-
-					if type == 'terrain':
-						terrain_tile_list = import_cut_graphics('../graphics/terrain/terrain_tiles.png')
-						tile_surface = terrain_tile_list[int(val)]
-						# print(x,y)
-						sprite = StaticTile(tile_size,x,y,tile_surface)
-
-						
-					if type == 'grass':
-						grass_tile_list = import_cut_graphics('../graphics/decoration/grass/grass.png')
-						tile_surface = grass_tile_list[int(val)]
-						sprite = StaticTile(tile_size,x,y,tile_surface)
-					
-					if type == 'crates':
-						sprite = Crate(tile_size,x,y)
-
-					if type == 'coins':
-						if val == '0': sprite = Coin(tile_size,x,y,'../graphics/coins/gold',5)
-						if val == '1': sprite = Coin(tile_size,x,y,'../graphics/coins/silver',1)
-
-					if type == 'fg palms':
-						if val == '0': sprite = Palm(tile_size,x,y,'../graphics/terrain/palm_small',38)
-						if val == '1': sprite = Palm(tile_size,x,y,'../graphics/terrain/palm_large',64)
-
-					if type == 'bg palms':
-						sprite = Palm(tile_size,x,y,'../graphics/terrain/palm_bg',64)
-
-					if type == 'enemies':
-						sprite = Enemy(tile_size,x,y)
-
-					if type == 'constraint':
-						sprite = Tile(tile_size,x,y)
-
-					sprite_group.add(sprite)
+			if type == 'terrain':
+				tile_surface = terrain_tile_list[val]
+				sprite = StaticTile(tile_size,x,y,tile_surface)
+
+			if type == 'grass':
+				tile_surface = grass_tile_list[val]
+				sprite = StaticTile(tile_size,x,y,tile_surface)
+			
+			if type == 'crates':
+				sprite = Crate(tile_size,x,y)
+
+			if type == 'coins':
+				if val == 0: sprite = Coin(tile_size,x,y,'../graphics/coins/gold',5)
+				if val == 1: sprite = Coin(tile_size,x,y,'../graphics/coins/silver',1)
+
+			if type == 'fg palms':
+				if val == 0: sprite = Palm(tile_size,x,y,'../graphics/terrain/palm_small',38)
+				if val == 1: sprite = Palm(tile_size,x,y,'../graphics/terrain/palm_large',64)
+
+			if type == 'bg palms':
+				sprite = Palm(tile_size,x,y,'../graphics/terrain/palm_bg',64)
+
+			if type == 'enemies':
+				sprite = Enemy(tile_size,x,y)
+
+			if type == 'constraint':
+				sprite = Tile(tile_size,x,y)
+
+			sprite_group.add(sprite)
 		
 		return sprite_group
 
 
-	def player_setup(self,layout,change_health):
-		self.player_start_pos = None  # Store player's start position
-		self.goal_pos = None  # Store goal position
-		for row_index, row in enumerate(layout):
-			for col_index,val in enumerate(row):
-				x = col_index * tile_size
-				y = row_index * tile_size
-				if val == '0':
-					sprite = Player((x,y),self.display_surface,self.create_jump_particles,change_health)
-					self.player.add(sprite)
-					self.player_start_pos = (x, y)
-				if val == '1':
-					hat_surface = pygame.image.load('../graphics/character/hat.png').convert_alpha()
-					sprite = StaticTile(tile_size,x,y,hat_surface)
-					self.goal.add(sprite)
-					self.goal_pos = (x, y)
+	def player_setup(self,start_pos,goal_pos,change_health):
+		# start and goal come precomputed from the level bundle
+		self.player_start_pos = start_pos
+		self.goal_pos = goal_pos
+
+		sprite = Player(start_pos,self.display_surface,self.create_jump_particles,change_health,self.headless,self.muted)
+		self.player.add(sprite)
+
+		hat_surface = import_image('../graphics/character/hat.png')
+		sprite = StaticTile(tile_size,goal_pos[0],goal_pos[1],hat_surface)
+		self.goal.add(sprite)
 
 	def enemy_collision_reverse(self):
 		for enemy in self.enemy_sprites.sprites():
-			if pygame.sprite.spritecollide(enemy,self.constraint_sprites,False):
+			constraints = self.constraint_grid.query(enemy.rect)
+			hits = [constraint for constraint in constraints if enemy.rect.colliderect(constraint.rect)]
+			self.pair_stats.record('constraints',len(constraints),len(hits))
+			if hits:
 				enemy.reverse()
+		self.enemy_grid = SpatialGrid(self.enemy_sprites)
 
 	def create_jump_particles(self,pos):
 		if self.player.sprite.facing_right:
 			pos -= pygame.math.Vector2(10,5)
 		else:
 			pos += pygame.math.Vector2(10,-5)
-		jump_particle_sprite = ParticleEffect(pos,'jump')
-		self.dust_sprite.add(jump_particle_sprite)
+		jump_particle_sprite = self.particles.spawn(pos,'jump')
+		self.add_dust(jump_particle_sprite)
+
+	def nearby_collidable_sprites(self,rect):
+		# one tile of margin covers every position the rect can be pushed to while resolving
+		return self.collision_grid.query(rect.inflate(tile_size * 2,tile_size * 2))
 
 	def horizontal_movement_collision(self):
 		player = self.player.sprite
 		player.collision_rect.x += player.direction.x * player.speed
-		collidable_sprites = self.terrain_sprites.sprites() + self.crate_sprites.sprites() + self.fg_palm_sprites.sprites()
-		for sprite in collidable_sprites:
+		for sprite in self.nearby_collidable_sprites(player.collision_rect):
 			if sprite.rect.colliderect(player.collision_rect):
 				if player.direction.x < 0: 
 					player.collision_rect.left = sprite.rect.right
@@ -190,14 +276,9 @@ class Level:
 		player = self.player.sprite
 		player.apply_gravity()
 		
-		# Combine all collidable sprites
-		collidable_sprites = (self.terrain_sprites.sprites() + 
-							self.crate_sprites.sprites() + 
-							self.fg_palm_sprites.sprites())
-		
 		player.on_ground = False  # Reset before checking
 		
-		for sprite in collidable_sprites:
+		for sprite in self.nearby_collidable_sprites(player.collision_rect):
 			if sprite.rect.colliderect(player.collision_rect):
 				if player.direction.y > 0:  # Falling down
 					player.collision_rect.bottom = sprite.rect.top
@@ -213,7 +294,7 @@ class Level:
 
 	def scroll_x(self):
 		player = self.player.sprite
-		player_x = player.rect.centerx
+		player_x = player.rect.centerx - self.camera_x
 		direction_x = player.direction.x
 
 		if player_x < screen_width / 4 and direction_x < 0:
@@ -225,8 +306,11 @@ class Level:
 		else:
 			self.world_shift = 0
 			player.speed = 8
-		# Accumulate world shift over time
-		self.total_shift += self.world_shift
+
+		# scrolling moves the camera and carries the player along, so it keeps its place on screen
+		self.camera_x -= self.world_shift
+		player.rect.x -= self.world_shift
+		player.collision_rect.x -= self.world_shift
 
 	def get_player_on_ground(self):
 		if self.player.sprite.on_ground:
@@ -240,8 +324,8 @@ class Level:
 				offset = pygame.math.Vector2(10,15)
 			else:
 				offset = pygame.math.Vector2(-10,15)
-			fall_dust_particle = ParticleEffect(self.player.sprite.rect.midbottom - offset,'land')
-			self.dust_sprite.add(fall_dust_particle)
+			fall_dust_particle = self.particles.spawn(self.player.sprite.rect.midbottom - offset,'land')
+			self.add_dust(fall_dust_particle)
 
 	def check_death(self):
 		if(control_ai==None):
@@ -272,32 +356,48 @@ class Level:
 			pass
 			
 	def check_coin_collisions(self):
-		collided_coins = pygame.sprite.spritecollide(self.player.sprite,self.coin_sprites,True)
+		# pickups are resolved where the player stood before this frame's scroll carried it along
+		player_rect = self.player.sprite.rect.move(self.world_shift,0)
+		coins = [coin for coin in self.coin_grid.query(player_rect) if coin.alive()]
+		collided_coins = [coin for coin in coins if player_rect.colliderect(coin.rect)]
+		self.pair_stats.record('coins',len(coins),len(collided_coins))
 		if collided_coins:
 			self.coin_sound.play()
 			for coin in collided_coins:
+				coin.kill()
 				self.change_coins(coin.value)
+				if self.events.wants(DEBUG):
+					self.events.event(DEBUG,'coin',x = coin.rect.centerx,y = coin.rect.centery,value = coin.value)
 
 	def check_enemy_collisions(self):
-		enemy_collisions = pygame.sprite.spritecollide(self.player.sprite,self.enemy_sprites,False)
+		player_rect = self.player.sprite.rect.move(self.world_shift,0)
+		enemies = self.enemy_grid.query(player_rect)
+		enemy_collisions = [enemy for enemy in enemies if player_rect.colliderect(enemy.rect)]
+		self.pair_stats.record('enemies',len(enemies),len(enemy_collisions))
 
 		if enemy_collisions:
 			for enemy in enemy_collisions:
 				enemy_center = enemy.rect.centery
 				enemy_top = enemy.rect.top
-				player_bottom = self.player.sprite.rect.bottom
+				player_bottom = player_rect.bottom
 				if enemy_top < player_bottom < enemy_center and self.player.sprite.direction.y >= 0:
 					self.stomp_sound.play()
 					self.player.sprite.direction.y = -15
-					explosion_sprite = ParticleEffect(enemy.rect.center,'explosion')
-					self.explosion_sprites.add(explosion_sprite)
+					explosion_sprite = self.particles.spawn(enemy.rect.center,'explosion')
+					if explosion_sprite is not None:
+						self.explosion_sprites.add(explosion_sprite)
+						self.show(explosion_sprite,EXPLOSION_LAYER)
 					enemy.kill()
+					if self.events.wants(DEBUG):
+						self.events.event(DEBUG,'stomp',x = enemy.rect.centerx,y = enemy.rect.centery)
 				else:
+					if self.events.wants(DEBUG) and not self.player.sprite.invincible:
+						self.events.event(DEBUG,'damage',x = player_rect.x,y = player_rect.y)
 					self.player.sprite.get_damage()
 
 	def get_position(self):
 		player = self.player.sprite  # Access the actual Player instance
-		return (self.player.sprite.rect.x - self.total_shift, player.rect.top, self.world_shift)
+		return (player.rect.x, player.rect.top, self.world_shift)
 	
 	def get_position_of_start_and_goal(self):
 		return {"player_start": self.player_start_pos, "goal": self.goal_pos}
@@ -315,60 +415,33 @@ class Level:
             5  # Small height for ground check
         )
         
-        # Check against all collidable terrain
-		collidable_sprites = (self.terrain_sprites.sprites() + 
-                            self.crate_sprites.sprites() + 
-                            self.fg_palm_sprites.sprites())
-        
-		for sprite in collidable_sprites:
+        # Check against nearby collidable terrain
+		for sprite in self.nearby_collidable_sprites(ground_check_rect):
 			if ground_check_rect.colliderect(sprite.rect):
 				self.on_ground = True
 				break
 	
 	def check_on_ground(self):
 		return self.on_ground
+
+	def get_enemy_centres(self):
+		return [enemy.rect.center for enemy in self.enemy_sprites]
+
+	def get_coin_centres(self):
+		return [coin.rect.center for coin in self.coin_sprites]
 	
-	def run(self):
-		# run the entire game / level 
-		# sky 
-		self.sky.draw(self.display_surface)
-		self.clouds.draw(self.display_surface,self.world_shift)
-		
-		# background palms
-		self.bg_palm_sprites.update(self.world_shift)
-		self.bg_palm_sprites.draw(self.display_surface) 
+	def update(self):
+		"""Advances the level one fixed 60 fps frame without drawing anything"""
+		self.bg_palm_sprites.update()
+		self.dust_sprite.update()
 
-		# dust particles 
-		self.dust_sprite.update(self.world_shift)
-		self.dust_sprite.draw(self.display_surface)
-		
-		# terrain 
-		self.terrain_sprites.update(self.world_shift)
-		self.terrain_sprites.draw(self.display_surface)
-		
 		# enemy 
-		self.enemy_sprites.update(self.world_shift)
-		self.constraint_sprites.update(self.world_shift)
+		self.enemy_sprites.update()
 		self.enemy_collision_reverse()
-		self.enemy_sprites.draw(self.display_surface)
-		self.explosion_sprites.update(self.world_shift)
-		self.explosion_sprites.draw(self.display_surface)
+		self.explosion_sprites.update()
 
-		# crate 
-		self.crate_sprites.update(self.world_shift)
-		self.crate_sprites.draw(self.display_surface)
-
-		# grass
-		self.grass_sprites.update(self.world_shift)
-		self.grass_sprites.draw(self.display_surface)
-
-		# coins 
-		self.coin_sprites.update(self.world_shift)
-		self.coin_sprites.draw(self.display_surface)
-
-		# foreground palms
-		self.fg_palm_sprites.update(self.world_shift)
-		self.fg_palm_sprites.draw(self.display_surface)
+		self.coin_sprites.update()
+		self.fg_palm_sprites.update()
 
 		# player sprites
 		self.player.update()
@@ -382,9 +455,6 @@ class Level:
 		self.check_player_ground()
 		
 		self.scroll_x()
-		self.player.draw(self.display_surface)
-		self.goal.update(self.world_shift)
-		self.goal.draw(self.display_surface)
 
 		self.check_death()
 		self.check_win()
@@ -392,16 +462,31 @@ class Level:
 		self.check_coin_collisions()
 		self.check_enemy_collisions()
 
-		# water 
-		self.water.draw(self.display_surface,self.world_shift)
+		# purely visual animations advance here too, once the player's status and ground contact are final
+		if not self.headless:
+			self.player.sprite.animate_run_dust()
+			self.water.update()
 
+	def draw(self,surface = None):
+		"""Draws the current state of the level, back to front, without advancing it"""
+		if self.headless:
+			return
+		if surface is None:
+			surface = self.display_surface
 
-		# player position
-		player_position = self.get_position()
-		# print("Player Position:", player_position)
+		# sky 
+		self.sky.draw(surface)
+		self.clouds.draw(surface,self.camera_x)
+
+		# the player's run dust goes between the foreground palms and the player
+		self.visible_sprites.draw(surface,self.camera_x,range(PLAYER_LAYER))
+		self.player.sprite.run_dust_animation(surface,self.camera_x)
+		self.visible_sprites.draw(surface,self.camera_x,range(PLAYER_LAYER,GOAL_LAYER + 1))
 
-		#start&goalposition
-		# positions = self.get_position_of_start_and_goal()
-		# print("Player Start Position:", positions["player_start"])
-		# print("Goal Position:", positions["goal"])
+		# water 
+		self.water.draw(surface,self.camera_x)
 
+	def run(self):
+		# run the entire game / level 
+		self.update()
+		self.draw()
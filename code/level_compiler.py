@@ -0,0 +1,108 @@
+import hashlib
+import os
+import sys
+import tempfile
+import zipfile
+import numpy as np
+from settings import tile_size
+from game_data import levels
+
+# every csv layer of a level, in the order they are stacked inside a bundle
+LAYERS = ('terrain','coins','fg palms','bg palms','crates','enemies','constraints','player','grass')
+BUNDLE_VERSION = 1
+BUNDLE_DIR = '../levels/compiled'
+
+_bundle_cache = {}
+
+class LevelBundle:
+	def __init__(self,level_index,layers,start,goal,source_hash):
+		self.level_index = level_index
+		self.layers = layers
+		self.start = start
+		self.goal = goal
+		self.source_hash = source_hash
+		self.height, self.width = layers.shape[1:]
+
+	def layer(self,name):
+		return self.layers[LAYERS.index(name)]
+
+def playable_levels():
+	"""Indices of the game_data levels with csv layers of their own; placeholders reusing another level's files are skipped"""
+	playable, seen = [], set()
+	for index, level_data in levels.items():
+		sources = tuple(level_data[name] for name in LAYERS)
+		if sources not in seen and all(os.path.exists(path) for path in sources):
+			seen.add(sources)
+			playable.append(index)
+	return tuple(playable)
+
+def bundle_path(level_index):
+	return f'{BUNDLE_DIR}/level_{level_index}.npz'
+
+def source_hash(level_index):
+	"""Hashes the raw csv bytes of every layer so edited levels invalidate their bundle"""
+	level_data = levels[level_index]
+	digest = hashlib.sha1(f'v{BUNDLE_VERSION}'.encode())
+	for name in LAYERS:
+		digest.update(name.encode())
+		with open(level_data[name],'rb') as f:
+			digest.update(f.read())
+	return digest.hexdigest()
+
+def find_start_and_goal(player_layout):
+	start = goal = None
+	for row_index, col_index in zip(*np.nonzero(player_layout != -1)):
+		pos = (int(col_index) * tile_size, int(row_index) * tile_size)
+		if player_layout[row_index,col_index] == 0: start = pos
+		if player_layout[row_index,col_index] == 1: goal = pos
+	return start, goal
+
+def compile_level(level_index,digest = None):
+	level_data = levels[level_index]
+	# parsed with numpy rather than support.import_csv_layout so the compiler never needs pygame
+	layers = np.stack([np.loadtxt(level_data[name],delimiter = ',',dtype = np.int16,ndmin = 2) for name in LAYERS])
+	start, goal = find_start_and_goal(layers[LAYERS.index('player')])
+	digest = digest or source_hash(level_index)
+
+	os.makedirs(BUNDLE_DIR,exist_ok = True)
+	# written next to the bundle and renamed over it, so a process loading it concurrently never sees half a file
+	fd, temp_path = tempfile.mkstemp(dir = BUNDLE_DIR,suffix = '.npz.tmp')
+	try:
+		with os.fdopen(fd,'wb') as f:
+			np.savez(f,
+				layers = layers,
+				start = np.array(start,dtype = np.int32),
+				goal = np.array(goal,dtype = np.int32),
+				source_hash = np.array(digest))
+		os.replace(temp_path,bundle_path(level_index))
+	except BaseException:
+		os.remove(temp_path)
+		raise
+	return LevelBundle(level_index,layers,start,goal,digest)
+
+def load_level_bundle(level_index):
+	"""Returns the compiled bundle of a level, rebuilding it when the csv sources changed"""
+	if level_index in _bundle_cache:
+		return _bundle_cache[level_index]
+
+	digest = source_hash(level_index)
+	bundle = None
+	if os.path.exists(bundle_path(level_index)):
+		try:
+			with np.load(bundle_path(level_index)) as data:
+				if str(data['source_hash']) == digest:
+					bundle = LevelBundle(level_index,data['layers'],tuple(data['start'].tolist()),tuple(data['goal'].tolist()),digest)
+		except (zipfile.BadZipFile,KeyError,ValueError,OSError,EOFError):
+			# a truncated or foreign file is a stale cache like any other
+			bundle = None
+	if bundle is None:
+		bundle = compile_level(level_index,digest)
+
+	_bundle_cache[level_index] = bundle
+	return bundle
+
+if __name__ == '__main__':
+	targets = [int(arg) for arg in sys.argv[1:]] or list(levels.keys())
+	for level_index in targets:
+		bundle = compile_level(level_index)
+		print(f'level {level_index}: {bundle_path(level_index)} {bundle.layers.shape} start {bundle.start} goal {bundle.goal}')
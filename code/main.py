@@ -2,28 +2,72 @@ import pygame, sys
 from settings import screen_width, screen_height
 from level import Level
 from ui import UI
+from support import import_sound
 import random
+from events import EventLog, INFO
+from simulation import frame_ticks
 
 class Game:
-    def __init__(self, external_screen=None):
-        """Initialize the game. Accepts an external screen if running from Gym."""
+    def __init__(self, external_screen=None, headless=False, events=None, muted=None, level=1, preload=(),
+                 frame_clock=False):
+        """Initialize the game. Accepts an external screen if running from Gym.
+
+        A headless game never draws, never opens a window and never decodes audio.
+        events is the EventLog the level records pickups, stomps and damage in.
+        muted (headless by default) silences music and effects of a game that still draws.
+        level is the level played first; the levels in preload are built up front so select_level never builds.
+        frame_clock times invincibility and blinking by frames played instead of wall-clock milliseconds,
+        which makes a run depend on nothing but its actions.
+        """
+        self.frame = 0
+        self.frame_clock = frame_clock
+        self.events = events or EventLog()
         self.max_health = 100
         self.cur_health = 100
         self.coins = 0
-        self.cur_level = 1  # Randomly select a level between 1 and 5
+        self.cur_level = level
+        self.headless = headless
+        self.muted = muted = headless if muted is None else muted
         # Audio 
-        self.level_bg_music = pygame.mixer.Sound('../audio/level_music.wav')
+        self.level_bg_music = import_sound('../audio/level_music.wav', muted=muted)
 
         # Use an external screen if provided (Gym), otherwise create a new one
-        self.screen = external_screen if external_screen else pygame.display.set_mode((screen_width, screen_height))
+        if external_screen:
+            self.screen = external_screen
+        elif headless:
+            self.screen = pygame.Surface((screen_width, screen_height))
+        else:
+            self.screen = pygame.display.set_mode((screen_width, screen_height))
         
-        # Directly start cur_level
-        self.level = Level(self.cur_level, self.screen, self.change_coins, self.change_health)
+        # Directly start cur_level; every level built is kept and later restored in place
+        self.worlds = {}
+        self.level = self.build_level(self.cur_level)
+        for index in preload:
+            self.build_level(index)
         self.status = 'level'
         self.level_bg_music.play(loops=-1)
 
         # UI setup
-        self.ui = UI(self.screen)
+        self.ui = UI(self.screen, headless=headless)
+
+    def build_level(self, index):
+        """The Level of index, built on first use"""
+        if index not in self.worlds:
+            self.worlds[index] = Level(index, self.screen, self.change_coins, self.change_health,
+                                       headless=self.headless, events=self.events, muted=self.muted)
+            if self.frame_clock:
+                self.worlds[index].player.sprite.get_ticks = self.ticks
+        return self.worlds[index]
+
+    def ticks(self):
+        """Milliseconds on the 60 fps frame clock"""
+        return frame_ticks(self.frame)
+
+    def select_level(self, index):
+        """Switch to level index and restart it"""
+        self.level = self.build_level(index)
+        self.cur_level = index
+        self.reset()
 
     def change_coins(self, amount):
         self.coins += amount
@@ -35,20 +79,53 @@ class Game:
         """Restart the level instead of quitting the game"""
         self.cur_health = 100  # Reset health
         self.coins = 0  # Reset coins
-        self.level = Level(self.cur_level, self.screen, self.change_coins, self.change_health)  # Restart cur_level
+        self.level.reset()  # Restore cur_level in place
         self.status = 'level'
 
-    def run(self):
-        """Run one frame of the game"""
-        self.level.run()
-        self.ui.show_health(self.cur_health, self.max_health)
-        self.ui.show_coins(self.coins)
+    def begin_episode(self):
+        """Clear the player's motion and settle it with one collision pass before a training episode"""
+        player = self.level.player.sprite
+        player.velocity_x = 0
+        player.velocity_y = 0
+        player.previous_pos = (player.rect.x, player.rect.y)
+        player.on_ground = False
+        player.on_left = False
+        player.on_right = False
+        player.on_ceiling = False
+
+        self.level.vertical_movement_collision()
+        self.level.horizontal_movement_collision()
+
+    def step(self, action):
+        """Apply an agent action and advance one frame without drawing it"""
+        self.level.player.sprite.get_input(action)
+        self.update()
+
+    def update(self):
+        """Advance the game one fixed 60 fps frame"""
+        self.frame += 1
+        self.level.update()
 
         # Restart the level when health reaches zero
         if self.cur_health <= 0:
+            self.events.event(INFO, "died", level=self.cur_level, coins=self.coins)
             self.reset()
         # Give condition to reset if player fall
 
+    def draw(self, surface=None):
+        """Draw the current frame and the UI onto surface, the game's screen by default"""
+        if self.headless:
+            return
+        surface = surface or self.screen
+        self.level.draw(surface)
+        self.ui.show_health(self.cur_health, self.max_health, surface)
+        self.ui.show_coins(self.coins, surface)
+
+    def run(self):
+        """Run one frame of the game and draw it"""
+        self.update()
+        self.draw()
+
 # Run the game normally if executed directly
 if __name__ == "__main__":
     pygame.init()
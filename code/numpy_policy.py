@@ -0,0 +1,128 @@
+import sys
+
+import numpy as np
+
+ACTIVATIONS = {
+    "Tanh": lambda x: np.tanh(x, out=x),
+    "ReLU": lambda x: np.maximum(x, 0, out=x),
+    "Identity": lambda x: x,
+}
+
+
+class NumpyPolicy:
+    """The actor of an exported PPO policy, run with NumPy alone
+
+    Observations are flattened and concatenated key by key like SB3's CombinedExtractor (or taken as one
+    array for a Box observation space), then pass through the policy MLP and the action head. predict
+    mirrors PPO.predict for one observation or a batch. int8 exports are dequantized once on load, so they
+    are smaller on disk but run at float32 speed.
+    """
+
+    def __init__(self, keys, shapes, layers, frame_skip=1):
+        self.keys = keys
+        # {key: shape} of one unbatched observation, "obs" for a Box space
+        self.shapes = shapes
+        self.sizes = [int(np.prod(shapes[key])) for key in keys]
+        self.layers = layers
+        # the frame_skip the policy was trained with, as train.py saves it on the model
+        self.frame_skip = frame_skip
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as artifact:
+            keys = artifact["keys"].tolist()
+            frame_skip = int(artifact["frame_skip"]) if "frame_skip" in artifact else 1
+            shapes = {key: tuple(artifact[f"shape.{key}"].tolist()) for key in keys}
+            layers = []
+            for index, activation in enumerate(artifact["activations"].tolist()):
+                weight = artifact[f"weight.{index}"]
+                if f"scale.{index}" in artifact:
+                    weight = weight.astype(np.float32) * artifact[f"scale.{index}"]
+                layers.append((np.ascontiguousarray(weight, dtype=np.float32), artifact[f"bias.{index}"],
+                               ACTIVATIONS[activation]))
+        return cls(keys, shapes, layers, frame_skip)
+
+    def logits(self, obs):
+        """Action logits of a batch of observations, (N, actions)"""
+        if not isinstance(obs, dict):
+            obs = {"obs": obs}
+        x = np.concatenate([np.asarray(obs[key], dtype=np.float32).reshape(-1, size)
+                            for key, size in zip(self.keys, self.sizes)], axis=1)
+        for weight, bias, activation in self.layers:
+            x = activation(x @ weight + bias)
+        return x
+
+    def predict(self, obs, deterministic=True, rng=None):
+        """(actions, None) like PPO.predict; unbatched observations give a single action"""
+        first = obs[self.keys[0]] if isinstance(obs, dict) else obs
+        batched = np.ndim(first) > len(self.shapes[self.keys[0]])
+        logits = self.logits(obs)
+        if not deterministic:
+            # Gumbel-max draws from the softmax of the logits
+            rng = rng or np.random.default_rng()
+            logits = logits - np.log(-np.log(rng.random(logits.shape)))
+        actions = logits.argmax(axis=1)
+        return (actions if batched else actions[0]), None
+
+
+def quantize(weight):
+    """Symmetric int8 weights with one float32 scale per output column"""
+    scale = np.abs(weight).max(axis=0) / 127
+    scale[scale == 0] = 1
+    return np.round(weight / scale).astype(np.int8), scale.astype(np.float32)
+
+
+def export(model_path, out_path, int8=False):
+    """Writes the actor of a saved PPO model to an .npz that NumpyPolicy.load reads without torch"""
+    from gymnasium import spaces
+    from stable_baselines3 import PPO
+    from torch import nn
+
+    model = PPO.load(model_path, device="cpu")
+    policy = model.policy
+    if not isinstance(model.action_space, spaces.Discrete):
+        raise ValueError(f"only Discrete action spaces can be exported, not {model.action_space}")
+    if isinstance(model.observation_space, spaces.Dict):
+        observation_spaces = dict(model.observation_space.spaces)
+        extractors = policy.pi_features_extractor.extractors
+        keys = list(extractors.keys())
+        unsupported = [key for key in keys if not isinstance(extractors[key], nn.Flatten)]
+    else:
+        observation_spaces = {"obs": model.observation_space}
+        keys = ["obs"]
+        unsupported = [] if isinstance(getattr(policy.pi_features_extractor, "flatten", None), nn.Flatten) else keys
+    if unsupported or not all(isinstance(observation_spaces[key], spaces.Box) for key in keys):
+        raise ValueError(f"only flattened Box observations can be exported, not {policy.pi_features_extractor}")
+
+    modules = list(policy.mlp_extractor.policy_net) + [policy.action_net]
+    layers = []
+    for module in modules:
+        if isinstance(module, nn.Linear):
+            layers.append([module.weight.detach().numpy().T, module.bias.detach().numpy(), "Identity"])
+        elif type(module).__name__ in ACTIVATIONS and layers:
+            layers[-1][2] = type(module).__name__
+        else:
+            raise ValueError(f"cannot export policy layer {module}")
+
+    artifact = {"keys": np.array(keys), "activations": np.array([activation for _, _, activation in layers]),
+                "frame_skip": np.array(getattr(model, "frame_skip", 1))}
+    for key in keys:
+        artifact[f"shape.{key}"] = np.array(observation_spaces[key].shape)
+    for index, (weight, bias, _) in enumerate(layers):
+        if int8:
+            artifact[f"weight.{index}"], artifact[f"scale.{index}"] = quantize(weight)
+        else:
+            artifact[f"weight.{index}"] = weight
+        artifact[f"bias.{index}"] = bias
+    with open(out_path, "wb") as file:
+        np.savez(file, **artifact)
+
+
+if __name__ == "__main__":
+    # python numpy_policy.py MODEL [int8]: exports ../model/MODEL.zip to ../model/MODEL.npz (MODEL.int8.npz),
+    # which run_ai.py plays with "python run_ai.py MODEL.npz"
+    name = sys.argv[1]
+    int8 = len(sys.argv) > 2 and sys.argv[2] == "int8"
+    out_path = f"../model/{name}.int8.npz" if int8 else f"../model/{name}.npz"
+    export(f"../model/{name}.zip", out_path, int8=int8)
+    print(f"exported {out_path}")
@@ -0,0 +1,173 @@
+import numpy as np
+from gymnasium import spaces
+from numpy.lib.stride_tricks import sliding_window_view
+
+from settings import tile_size, screen_height
+
+# the window cut around the player: rows dy in [-5, 10), columns dx in [-1, 10)
+GRID_ROWS = np.arange(-5, 10)
+GRID_COLS = np.arange(-1, 10)
+GRID_PAD = 16
+
+CHANNELS = ("terrain", "enemies", "coins", "crates", "water")
+# channels read from the level layout, the others are rasterized from entity positions every step
+STATIC_CHANNELS = ("terrain", "crates", "water")
+WATER_TOP = screen_height - 20
+
+
+def validate_channels(channels):
+    channels = tuple(channels)
+    unknown = [channel for channel in channels if channel not in CHANNELS]
+    if unknown or not channels or len(set(channels)) != len(channels):
+        raise ValueError(f"observation channels must be distinct names from {CHANNELS}, got {channels!r}")
+    return channels
+
+
+def static_layers(bundles, channels):
+    """Static channels of every level, stacked as (levels, rows, cols, channels) and framed with GRID_PAD cells
+
+    Layers are indexed like the compiled csvs; water covers every row the water line reaches, padding included.
+    """
+    height = max(bundle.height for bundle in bundles)
+    width = max(bundle.width for bundle in bundles)
+    padded = np.zeros((len(bundles), height + 2 * GRID_PAD, width + 2 * GRID_PAD, len(channels)), dtype=np.float32)
+    for index, bundle in enumerate(bundles):
+        rows, cols = bundle.height, bundle.width
+        for channel, name in enumerate(channels):
+            if name in ("terrain", "crates"):
+                padded[index, GRID_PAD:GRID_PAD + rows, GRID_PAD:GRID_PAD + cols, channel] = bundle.layer(name) != -1
+            elif name == "water":
+                padded[index, GRID_PAD + WATER_TOP // tile_size:, :, channel] = 1
+    return padded
+
+
+class ObservationBuilder:
+    """Builds the grid observation of PlatformerEnv and PlatformerVecEnv with NumPy
+
+    Static windows are looked up in an atlas of every window of the pre-padded static layers; enemy and
+    coin channels are rasterized from entity centres in world pixels. Rows follow the original
+    _get_obs, which reads the layer at height - 1 - player_row + dy.
+    """
+
+    def __init__(self, bundles, channels=("terrain",)):
+        self.channels = validate_channels(channels)
+        self.layers = static_layers(bundles, self.channels)
+        self.heights = np.array([bundle.height for bundle in bundles])
+        self.shape = (len(GRID_ROWS), len(GRID_COLS), len(self.channels))
+        # (level, top, left, rows, cols, channels): a read-only strided view sharing the memory of layers
+        self.atlas = sliding_window_view(self.layers, self.shape[:2], axis=(1, 2)).transpose(0, 1, 2, 4, 5, 3)
+        self.enemy_channel = self.channels.index("enemies") if "enemies" in self.channels else None
+        self.coin_channel = self.channels.index("coins") if "coins" in self.channels else None
+
+    @property
+    def uses_entities(self):
+        return self.enemy_channel is not None or self.coin_channel is not None
+
+    def atlas_bytes(self):
+        """Bytes held per level by the atlas, and what materializing every window would take instead"""
+        levels, tops, lefts = self.atlas.shape[:3]
+        return self.layers.nbytes // levels, tops * lefts * self.atlas[0, 0, 0].nbytes
+
+    def observe(self, level, x, y, enemies=None, coins=None):
+        """The (15, 11, channels) window of one player; enemies and coins are sequences of (x, y) centres
+
+        Without enemy or coin channels this is a read-only view into the atlas.
+        """
+        # int() truncates towards zero like the original loop did
+        grid_x = int(x / tile_size)
+        grid_y = int(self.heights[level]) - 1 - int(y / tile_size)
+        top_row = grid_y + int(GRID_ROWS[0])
+        left_col = grid_x + int(GRID_COLS[0])
+        rows, cols = self.shape[:2]
+        _, tops, lefts = self.atlas.shape[:3]
+        top = min(max(top_row + GRID_PAD, 0), tops - 1)
+        left = min(max(left_col + GRID_PAD, 0), lefts - 1)
+        if not self.uses_entities:
+            return self.atlas[level, top, left]
+        obs = self.atlas[level, top, left].copy()
+
+        # one player sees a handful of entities, too few for NumPy calls to beat a plain loop
+        for channel, centres in ((self.enemy_channel, enemies), (self.coin_channel, coins)):
+            if channel is None or centres is None:
+                continue
+            for centre_x, centre_y in centres:
+                row = centre_y // tile_size - top_row
+                col = centre_x // tile_size - left_col
+                if 0 <= row < rows and 0 <= col < cols:
+                    obs[row, col, channel] = 1
+        return obs
+
+    def observe_batch(self, level, x, y, enemies=None, coins=None):
+        """observe for many players at once, returns (N, 15, 11, channels)
+
+        enemies and coins are (centres, alive) pairs of (N, K, 2) and (N, K) arrays.
+        """
+        grid_x = (x / tile_size).astype(np.int64)
+        grid_y = self.heights[level] - 1 - (y / tile_size).astype(np.int64)
+        _, tops, lefts = self.atlas.shape[:3]
+        top = np.clip(grid_y + GRID_ROWS[0] + GRID_PAD, 0, tops - 1)
+        left = np.clip(grid_x + GRID_COLS[0] + GRID_PAD, 0, lefts - 1)
+        # one indexed copy of each world's window
+        obs = self.atlas[level, top, left]
+
+        for channel, entities in ((self.enemy_channel, enemies), (self.coin_channel, coins)):
+            if channel is None or entities is None:
+                continue
+            centres, alive = entities
+            rows = centres[..., 1] // tile_size - grid_y[:, None] - GRID_ROWS[0]
+            cols = centres[..., 0] // tile_size - grid_x[:, None] - GRID_COLS[0]
+            inside = alive & (rows >= 0) & (rows < self.shape[0]) & (cols >= 0) & (cols < self.shape[1])
+            worlds, entity = np.nonzero(inside)
+            obs[worlds, rows[worlds, entity], cols[worlds, entity], channel] = 1
+        return obs
+
+
+class FrameStack:
+    """The last n observations of one or num_worlds envs, stacked on the last axis like VecFrameStack
+
+    Each key keeps a preallocated buffer of 2 * n slots where every frame is written twice, n slots apart,
+    so the n latest frames are always one contiguous run, oldest frame first, and a stacked observation is a
+    single slice copy instead of a concatenation. The copies stay valid however the stack moves on, which
+    SB3 relies on: it stores an observation in its rollout buffer only after the next step. A restart
+    clears the older frames to zeros, as VecFrameStack does.
+    """
+
+    def __init__(self, space, n, num_worlds=None):
+        self.n = n
+        self.position = 0
+        lead = () if num_worlds is None else (num_worlds,)
+        self.widths = {key: box.shape[-1] for key, box in space.spaces.items()}
+        self.buffers = {key: np.zeros(lead + box.shape[:-1] + (2 * n * box.shape[-1],), dtype=box.dtype)
+                        for key, box in space.spaces.items()}
+        self.space = spaces.Dict({
+            key: spaces.Box(low=np.concatenate([box.low] * n, axis=-1), high=np.concatenate([box.high] * n, axis=-1),
+                            dtype=box.dtype)
+            for key, box in space.spaces.items()
+        })
+
+    def _write(self, obs, worlds=None):
+        for key, buffer in self.buffers.items():
+            width = self.widths[key]
+            for slot in (self.position, self.position + self.n):
+                if worlds is None:
+                    buffer[..., slot * width:(slot + 1) * width] = obs[key]
+                else:
+                    buffer[worlds, ..., slot * width:(slot + 1) * width] = obs[key][worlds]
+
+    def _stacked(self):
+        start = self.position + 1
+        return {key: buffer[..., start * self.widths[key]:(start + self.n) * self.widths[key]].copy()
+                for key, buffer in self.buffers.items()}
+
+    def push(self, obs):
+        """Appends every env's newest observation and returns the stacked observations"""
+        self.position = (self.position + 1) % self.n
+        self._write(obs)
+        return self._stacked()
+
+    def reset(self, obs, worlds=None):
+        """Starts the stacks of worlds (every env by default) over from obs, returns the stacked observations"""
+        for buffer in self.buffers.values():
+            buffer[slice(None) if worlds is None else worlds] = 0
+        self._write(obs, worlds)
+        return self._stacked()
@@ -1,12 +1,13 @@
 import pygame 
 from game_data import levels
-from support import import_folder
+from support import import_folder, import_image
 from decoration import Sky
 
 class Node(pygame.sprite.Sprite):
 	def __init__(self,pos,status,icon_speed,path):
 		super().__init__()
-		self.frames = import_folder(path)
+		# locked nodes tint their frames in place, so work on private copies of the shared frames
+		self.frames = [frame.copy() for frame in import_folder(path)]
 		self.frame_index = 0
 		self.image = self.frames[self.frame_index]
 		if status == 'available':
@@ -35,7 +36,7 @@ class Icon(pygame.sprite.Sprite):
 	def __init__(self,pos):
 		super().__init__()
 		self.pos = pos
-		self.image = pygame.image.load('../graphics/overworld/hat.png').convert_alpha()
+		self.image = import_image('../graphics/overworld/hat.png')
 		self.rect = self.image.get_rect(center = pos)
 
 	def update(self):
@@ -1,19 +1,25 @@
 import pygame
 from support import import_folder
 
+EFFECT_PATHS = {
+	'jump': '../graphics/character/dust_particles/jump',
+	'land': '../graphics/character/dust_particles/land',
+	'explosion': '../graphics/enemy/explosion'}
+
 class ParticleEffect(pygame.sprite.Sprite):
 	def __init__(self,pos,type):
 		super().__init__()
-		self.frame_index = 0
 		self.animation_speed = 0.5
-		if type == 'jump':
-			self.frames = import_folder('../graphics/character/dust_particles/jump')
-		if type == 'land':
-			self.frames = import_folder('../graphics/character/dust_particles/land')
-		if type == 'explosion':
-			self.frames = import_folder('../graphics/enemy/explosion')
+		self.rect = pygame.Rect(0,0,0,0)
+		self.spawn(pos,import_folder(EFFECT_PATHS[type]))
+
+	def spawn(self,pos,frames):
+		"""Restarts the effect in place with another frame set, centred on pos"""
+		self.frames = frames
+		self.frame_index = 0
 		self.image = self.frames[self.frame_index]
-		self.rect = self.image.get_rect(center = pos)
+		self.rect.size = self.image.get_size()
+		self.rect.center = pos
 
 	def animate(self):
 		self.frame_index += self.animation_speed
@@ -22,6 +28,27 @@ class ParticleEffect(pygame.sprite.Sprite):
 		else:
 			self.image = self.frames[int(self.frame_index)]
 
-	def update(self,x_shift):
+	def update(self):
 		self.animate()
-		self.rect.x += x_shift
+
+class ParticlePool:
+	"""A fixed set of reusable effects; a particle is free again once it belongs to no group
+
+	Frames of every effect type are loaded up front. Headless pools hold nothing and spawn nothing.
+	"""
+	def __init__(self,capacity = 8,headless = False):
+		self.headless = headless
+		self.frames = {}
+		self.particles = []
+		if headless:
+			return
+		self.frames = {type: import_folder(path) for type, path in EFFECT_PATHS.items()}
+		self.particles = [ParticleEffect((0,0),'jump') for _ in range(capacity)]
+
+	def spawn(self,pos,type):
+		"""Returns a free particle restarted as a type effect at pos, or None when headless or all are in use"""
+		for particle in self.particles:
+			if not particle.alive():
+				particle.spawn(pos,self.frames[type])
+				return particle
+		return None
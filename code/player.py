@@ -1,15 +1,44 @@
 import pygame 
-from support import import_folder
+from support import import_folder_variant, import_sound
 from math import sin
 import sys
 from settings import control_ai
 
 class Player(pygame.sprite.Sprite):
-	def __init__(self,pos,surface,create_jump_particles,change_health):
+	def __init__(self,pos,surface,create_jump_particles,change_health,headless = False,muted = None):
 		super().__init__()
+		self.headless = headless
 		self.import_character_assets()
-		self.frame_index = 0
 		self.animation_speed = 0.15
+		self.max_fall_velocity = 20  # Optional: cap maximum falling speed
+
+		# dust particles 
+		self.import_dust_run_particles()
+		self.dust_animation_speed = 0.15
+		self.display_surface = surface
+		self.create_jump_particles = create_jump_particles
+
+		# player movement
+		self.gravity = 0.8
+		self.jump_speed = -16
+
+		# health management
+		self.change_health = change_health
+		self.invincibility_duration = 500
+		# millisecond clock behind invincibility and blinking; deterministic runs swap in a frame clock
+		self.get_ticks = pygame.time.get_ticks
+
+		self.reset(pos)
+
+		# audio 
+		muted = headless if muted is None else muted
+		self.jump_sound = import_sound('../audio/effects/jump.wav',muted = muted)
+		self.jump_sound.set_volume(0.5)
+		self.hit_sound = import_sound('../audio/effects/hit.wav',muted = muted)
+
+	def reset(self,pos):
+		"""Puts the player back at pos with fresh movement, status and invincibility state"""
+		self.frame_index = 0
 		self.image = self.animations['idle'][self.frame_index]
 		self.rect = self.image.get_rect(topleft = pos)
 		
@@ -18,20 +47,12 @@ class Player(pygame.sprite.Sprite):
 		self.velocity_y = 0
 		self.velocity_x = 0
 		self.previous_y = pos[1]  # Track previous y position for velocity calculation
-		self.max_fall_velocity = 20  # Optional: cap maximum falling speed
 
-		# dust particles 
-		self.import_dust_run_particles()
 		self.dust_frame_index = 0
-		self.dust_animation_speed = 0.15
-		self.display_surface = surface
-		self.create_jump_particles = create_jump_particles
 
 		# player movement
 		self.direction = pygame.math.Vector2(0,0)
 		self.speed = 8
-		self.gravity = 0.8
-		self.jump_speed = -16
 		self.collision_rect = pygame.Rect(self.rect.topleft,(50,self.rect.height))
 
 		# player status
@@ -42,68 +63,59 @@ class Player(pygame.sprite.Sprite):
 		self.on_left = False
 		self.on_right = False
 
-		# health management
-		self.change_health = change_health
 		self.invincible = False
-		self.invincibility_duration = 500
 		self.hurt_time = 0
 
-		# audio 
-		self.jump_sound = pygame.mixer.Sound('../audio/effects/jump.wav')
-		self.jump_sound.set_volume(0.5)
-		self.hit_sound = pygame.mixer.Sound('../audio/effects/hit.wav')
-
 	def import_character_assets(self):
 		character_path = '../graphics/character/'
-		self.animations = {'idle':[],'run':[],'jump':[],'fall':[]}
-
-		for animation in self.animations.keys():
-			full_path = character_path + animation
-			self.animations[animation] = import_folder(full_path)
+		# frames for each facing and for the hidden half of the invincibility blink, keyed (facing_right, alpha)
+		self.animation_variants = {}
+		for facing_right in (True,False):
+			for alpha in (255,0):
+				self.animation_variants[facing_right,alpha] = {
+					animation: import_folder_variant(character_path + animation,flipped = not facing_right,alpha = alpha)
+					for animation in ('idle','run','jump','fall')}
+		self.animations = self.animation_variants[True,255]
 
 	def import_dust_run_particles(self):
-		self.dust_run_particles = import_folder('../graphics/character/dust_particles/run')
+		self.dust_run_particles = import_folder_variant('../graphics/character/dust_particles/run')
+		self.flipped_dust_run_particles = import_folder_variant('../graphics/character/dust_particles/run',flipped = True)
 
 	def animate(self):
-		animation = self.animations[self.status]
+		# blinking and facing pick a prepared frame set, so animating never creates or alters a Surface
+		alpha = self.wave_value() if self.invincible and not self.headless else 255
+		animation = self.animation_variants[self.facing_right,alpha][self.status]
 
 		# loop over frame index 
 		self.frame_index += self.animation_speed
 		if self.frame_index >= len(animation):
 			self.frame_index = 0
 
-		image = animation[int(self.frame_index)]
+		self.image = animation[int(self.frame_index)]
+
 		if self.facing_right:
-			self.image = image
 			self.rect.bottomleft = self.collision_rect.bottomleft
 		else:
-			flipped_image = pygame.transform.flip(image,True,False)
-			self.image = flipped_image
 			self.rect.bottomright = self.collision_rect.bottomright
 
-		if self.invincible:
-			alpha = self.wave_value()
-			self.image.set_alpha(alpha)
-		else:
-			self.image.set_alpha(255)
-
+		# flipping and blinking only change pixels, the rect below depends on the frame size alone
 		self.rect = self.image.get_rect(midbottom = self.rect.midbottom)		
 
-	def run_dust_animation(self):
-		if self.status == 'run' and self.on_ground:
+	def animate_run_dust(self):
+		if self.status == 'run' and self.on_ground and not self.headless:
 			self.dust_frame_index += self.dust_animation_speed
 			if self.dust_frame_index >= len(self.dust_run_particles):
 				self.dust_frame_index = 0
 
-			dust_particle = self.dust_run_particles[int(self.dust_frame_index)]
-
+	def run_dust_animation(self,surface,camera_x = 0):
+		if self.status == 'run' and self.on_ground and not self.headless:
 			if self.facing_right:
-				pos = self.rect.bottomleft - pygame.math.Vector2(6,10)
-				self.display_surface.blit(dust_particle,pos)
+				dust_particle = self.dust_run_particles[int(self.dust_frame_index)]
+				pos = self.rect.bottomleft - pygame.math.Vector2(6 + camera_x,10)
 			else:
-				pos = self.rect.bottomright - pygame.math.Vector2(6,10)
-				flipped_dust_particle = pygame.transform.flip(dust_particle,True,False)
-				self.display_surface.blit(flipped_dust_particle,pos)
+				dust_particle = self.flipped_dust_run_particles[int(self.dust_frame_index)]
+				pos = self.rect.bottomright - pygame.math.Vector2(6 + camera_x,10)
+			surface.blit(dust_particle,pos)
 
 	def get_input(self, ai_action=control_ai):
 		"""Handles player input: AI-controlled or keyboard-based"""
@@ -202,7 +214,7 @@ class Player(pygame.sprite.Sprite):
 			self.hit_sound.play()
 			self.change_health(-10)
 			self.invincible = True
-			self.hurt_time = pygame.time.get_ticks()
+			self.hurt_time = self.get_ticks()
 
 	def _update_velocities(self):
 		"""Calculate pixel-per-frame velocities"""
@@ -213,12 +225,12 @@ class Player(pygame.sprite.Sprite):
 
 	def invincibility_timer(self):
 		if self.invincible:
-			current_time = pygame.time.get_ticks()
+			current_time = self.get_ticks()
 			if current_time - self.hurt_time >= self.invincibility_duration:
 				self.invincible = False
 
 	def wave_value(self):
-		value = sin(pygame.time.get_ticks())
+		value = sin(self.get_ticks())
 		if value >= 0: return 255
 		else: return 0
 
@@ -230,7 +242,6 @@ class Player(pygame.sprite.Sprite):
 		self.get_input()
 		self.get_status()
 		self.animate()
-		self.run_dust_animation()
 		self.invincibility_timer()
 		self.wave_value()
 		self._update_velocities()
@@ -0,0 +1,237 @@
+import json
+import struct
+import sys
+
+import gymnasium as gym
+import numpy as np
+
+# File layout, little-endian and append-only:
+#   header   MAGIC, u16 version, u32 length, that many bytes of JSON env settings
+#   records  one tag byte each, followed by
+#     E  i64 seed (-1 for none), u16 level                       an episode starts
+#     A  u32 count, ceil(count / 4) bytes                         actions, four 2-bit actions per byte
+#     C  u64 step, u32 checksum                                   PlatformerEnv.state_checksum after that step
+#     X  u64 steps, u8 terminated, u8 truncated                   the episode ended
+MAGIC = b"PLRP"
+VERSION = 1
+HEADER = struct.Struct("<4sHI")
+EPISODE = struct.Struct("<qH")
+ACTIONS = struct.Struct("<I")
+CHECKSUM = struct.Struct("<QI")
+END = struct.Struct("<QBB")
+# settings that change what a recorded action stream does; everything else only shapes observations
+SETTINGS = ("backend", "frame_skip")
+
+
+def pack_actions(actions):
+    actions = np.asarray(actions, dtype=np.uint8)
+    padded = np.zeros(-(-len(actions) // 4) * 4, dtype=np.uint8)
+    padded[:len(actions)] = actions
+    quads = padded.reshape(-1, 4)
+    return (quads[:, 0] | quads[:, 1] << 2 | quads[:, 2] << 4 | quads[:, 3] << 6).astype(np.uint8).tobytes()
+
+
+def unpack_actions(data, count):
+    packed = np.frombuffer(data, dtype=np.uint8)
+    return (packed[:, None] >> np.array([0, 2, 4, 6], dtype=np.uint8) & 3).reshape(-1)[:count]
+
+
+class RecordEpisodes(gym.Wrapper):
+    """Appends the seed, level and action stream of every episode of a PlatformerEnv to a binary log
+
+    A checksum of the game state is written every checksum_every steps and when an episode ends, so
+    replay() can tell where a re-simulation first leaves the recorded run; checksum_every=1 pins that to
+    the exact step at five extra bytes per step. Actions are buffered and flushed in chunks of chunk_size,
+    which keeps the log at a quarter of a byte per step otherwise.
+    """
+
+    def __init__(self, env, path, checksum_every=100, chunk_size=4096):
+        super().__init__(env)
+        self.checksum_every = checksum_every
+        self.chunk_size = chunk_size
+        settings = {name: getattr(env.unwrapped, name) for name in SETTINGS}
+        self.file = open(path, "ab")
+        if self.file.tell() == 0:
+            encoded = json.dumps(settings).encode()
+            self.file.write(HEADER.pack(MAGIC, VERSION, len(encoded)) + encoded)
+        else:
+            # appended episodes are replayed with the settings of the first recording; the backends play
+            # identically, so only frame_skip has to match
+            with open(path, "rb") as existing:
+                recorded, _ = read_log(existing)
+            if recorded["frame_skip"] != settings["frame_skip"]:
+                self.file.close()
+                raise ValueError(f"{path} was recorded with {recorded}, not {settings}")
+        self.actions = []
+        self.steps = 0
+        self.recording = False
+
+    def reset(self, *, seed=None, options=None):
+        self._end_episode(False, False)
+        obs, info = self.env.reset(seed=seed, options=options)
+        self.file.write(b"E" + EPISODE.pack(-1 if seed is None else seed, info["level"]))
+        self.steps = 0
+        self.recording = True
+        return obs, info
+
+    def step(self, action):
+        obs, reward, terminated, truncated, info = self.env.step(action)
+        self.actions.append(int(action))
+        self.steps += 1
+        if len(self.actions) >= self.chunk_size:
+            self._flush_actions()
+        if terminated or truncated:
+            self._end_episode(terminated, truncated)
+        elif self.steps % self.checksum_every == 0:
+            self._write_checksum()
+        return obs, reward, terminated, truncated, info
+
+    def _flush_actions(self):
+        if self.actions:
+            self.file.write(b"A" + ACTIONS.pack(len(self.actions)) + pack_actions(self.actions))
+            self.actions = []
+
+    def _write_checksum(self):
+        self._flush_actions()
+        self.file.write(b"C" + CHECKSUM.pack(self.steps, self.env.unwrapped.state_checksum()))
+
+    def _end_episode(self, terminated, truncated):
+        if not self.recording:
+            return
+        self._write_checksum()
+        self.file.write(b"X" + END.pack(self.steps, terminated, truncated))
+        self.recording = False
+
+    def close(self):
+        """Ends the open episode, as if truncated, and closes the log"""
+        if not self.file.closed:
+            self._end_episode(False, True)
+            self.file.close()
+        super().close()
+
+
+def read_log(file):
+    """Streams (settings, records) from an open log; records yields (tag, values) one record at a time"""
+    magic, version, length = HEADER.unpack(file.read(HEADER.size))
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"not a version {VERSION} replay log")
+    settings = json.loads(file.read(length))
+
+    def records():
+        while tag := file.read(1):
+            if tag == b"E":
+                yield tag, EPISODE.unpack(file.read(EPISODE.size))
+            elif tag == b"A":
+                (count,) = ACTIONS.unpack(file.read(ACTIONS.size))
+                yield tag, unpack_actions(file.read(-(-count // 4)), count)
+            elif tag == b"C":
+                yield tag, CHECKSUM.unpack(file.read(CHECKSUM.size))
+            elif tag == b"X":
+                yield tag, END.unpack(file.read(END.size))
+            else:
+                raise ValueError(f"corrupt replay log: unknown record {tag!r} at byte {file.tell() - 1}")
+
+    return settings, records()
+
+
+class Divergence(Exception):
+    """A re-simulated episode left the recorded run between last_good_step and step
+
+    divergent_step is the first step whose state differs, or None when the log cannot tell.
+    """
+
+    def __init__(self, episode, step, last_good_step, expected, got, divergent_step=None):
+        if divergent_step is None:
+            where = f"diverged after step {last_good_step} and by step {step}"
+        else:
+            where = f"first diverged at step {divergent_step}"
+        super().__init__(f"episode {episode} {where}: checksum {got:#010x} at step {step}, recorded {expected:#010x}")
+        self.episode = episode
+        self.step = step
+        self.last_good_step = last_good_step
+        self.divergent_step = divergent_step
+
+
+def _first_divergent_step(settings, recorded_settings, seed, level, actions, last_good_step):
+    """Steps an episode on the replay and the recorded settings side by side and returns the first step whose
+    checksums differ, or None if they agree on every action"""
+    from game_env import PlatformerEnv
+
+    envs = [PlatformerEnv(render_mode=None, **settings), PlatformerEnv(render_mode=None, **recorded_settings)]
+    try:
+        for env in envs:
+            env.reset(seed=None if seed == -1 else seed, options={"level": level})
+        for step, action in enumerate(actions, 1):
+            for env in envs:
+                env.step(action)
+            if step > last_good_step and envs[0].state_checksum() != envs[1].state_checksum():
+                return step
+        return None
+    finally:
+        for env in envs:
+            env.close()
+
+
+def replay(path, backend=None, max_episodes=None):
+    """Re-simulates every episode of a log headless and returns (episodes, steps)
+
+    backend overrides the recorded one, which checks the two backends against each other. Raises
+    Divergence at the first checksum that does not match. Its divergent_step is exact when the log holds a
+    checksum for every step; otherwise a backend override re-runs the episode on both backends in lockstep
+    to find it, while a same-backend mismatch can only be placed within its checksum window.
+    """
+    from game_env import PlatformerEnv
+
+    with open(path, "rb") as file:
+        recorded_settings, records = read_log(file)
+        settings = dict(recorded_settings)
+        if backend is not None:
+            settings["backend"] = backend
+        env = PlatformerEnv(render_mode=None, **settings)
+        episodes = steps = 0
+        episode = -1
+        last_good_step = 0
+        # the actions of the current episode, to re-run a checksum window step by step
+        actions = []
+        for tag, values in records:
+            if tag == b"E":
+                if max_episodes is not None and episodes == max_episodes:
+                    break
+                seed, level = values
+                env.reset(seed=None if seed == -1 else seed, options={"level": level})
+                episode += 1
+                last_good_step = 0
+                actions = []
+            elif tag == b"A":
+                values = values.tolist()
+                for action in values:
+                    env.step(action)
+                actions += values
+                steps += len(values)
+            elif tag == b"C":
+                recorded_step, expected = values
+                got = env.state_checksum()
+                if got != expected:
+                    env.close()
+                    if recorded_step - last_good_step == 1:
+                        divergent_step = recorded_step
+                    elif settings != recorded_settings:
+                        divergent_step = _first_divergent_step(settings, recorded_settings, seed, level,
+                                                               actions[:recorded_step], last_good_step)
+                    else:
+                        divergent_step = None
+                    raise Divergence(episode, recorded_step, last_good_step, expected, got, divergent_step)
+                last_good_step = recorded_step
+            elif tag == b"X":
+                episodes += 1
+        env.close()
+    return episodes, steps
+
+
+if __name__ == "__main__":
+    # python replay.py LOG [backend]: re-simulates a recorded log and reports the first divergence
+    try:
+        episodes, steps = replay(sys.argv[1], backend=sys.argv[2] if len(sys.argv) > 2 else None)
+    except Divergence as divergence:
+        sys.exit(str(divergence))
+    print(f"{episodes} episodes, {steps} steps replayed without divergence")
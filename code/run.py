@@ -18,7 +18,8 @@ elif (li[1] == "ai"):
     if os.path.exists(absolute_path) and os.path.isdir(absolute_path):
         files = os.listdir(absolute_path)
 
-        model_full_name = f"{model_name}.zip"
+        # exported policies are named with their .npz extension
+        model_full_name = model_name if model_name.endswith(".npz") else f"{model_name}.zip"
         if model_full_name in files:
             os.system(f"python run_ai.py {model_name}")
         else:
@@ -1,33 +1,52 @@
-import gymnasium as gym
-from stable_baselines3 import PPO
+from gymnasium import spaces
 from game_env import PlatformerEnv
-import numpy as np
 import sys
 
-# Load the trained model
-model = PPO.load(f"../model/{sys.argv[1]}")
+# Load the trained model; a .npz exported by numpy_policy.py runs without torch or stable-baselines3
+if sys.argv[1].endswith(".npz"):
+    from numpy_policy import NumpyPolicy
+    model = NumpyPolicy.load(f"../model/{sys.argv[1]}")
+    shapes = model.shapes
+else:
+    from stable_baselines3 import PPO
+    model = PPO.load(f"../model/{sys.argv[1]}")
+    if isinstance(model.observation_space, spaces.Dict):
+        shapes = {key: space.shape for key, space in model.observation_space.spaces.items()}
+    else:
+        shapes = {"obs": model.observation_space.shape}
 
 # Verify the model's observation space
-print("Model's observation space:", model.observation_space)
+print("Model's observation shapes:", shapes)
+# the env observes the channels train.py trains on, stacked as deep as the model's grid allows
+obs_channels = ("terrain",)
+grid_depth = shapes["grid"][-1] if "grid" in shapes else len(obs_channels)
+env_kwargs = dict(obs_channels=obs_channels, obs_features="features" in shapes,
+                  frame_stack=max(grid_depth // len(obs_channels), 1), frame_skip=getattr(model, "frame_skip", 1))
+probe = PlatformerEnv(render_mode=None, **env_kwargs)
+env_shapes = {key: space.shape for key, space in probe.observation_space.spaces.items()}
+probe.close()
+if env_shapes != shapes:
+    sys.exit(f"the model expects observations shaped {shapes}, the environment provides {env_shapes}")
 
-# Create the custom environment
-env = PlatformerEnv(render_mode='human')
+# python run_ai.py MODEL INSTANCES [STEPS]: evaluates headless, with that many envs on threads sharing
+# batched forward passes, and reports the batching and action latency
+if len(sys.argv) > 2:
+    from inference import run_fleet
+    instances = int(sys.argv[2])
+    steps = int(sys.argv[3]) if len(sys.argv) > 3 else 1000
+    episodes, elapsed, stats = run_fleet(model, instances, steps, env_kwargs=env_kwargs)
+    print(f"{instances} instances: {episodes} episodes, {steps * instances / elapsed:.0f} steps/sec")
+    print(f"batch sizes {stats['batch_sizes']}, mean {stats['mean_batch']:.1f}")
+    print(f"action latency p50 {stats['p50_ms']:.2f} ms, p99 {stats['p99_ms']:.2f} ms")
+    sys.exit()
+
+# Create the custom environment, stacking as many frames as the model was trained on
+env = PlatformerEnv(render_mode='human', **env_kwargs)
 
 # Run episodes indefinitely
 while True:
     # Reset the environment and get the initial observation
-    obs_dict, _ = env.reset()
-    
-    # Convert observation to match what the model expects
-    # The model expects (15, 11, 4) but environment provides (15, 11, 1)
-    # We'll replicate the single channel to 4 channels
-    original_grid = np.array(obs_dict["grid"], dtype=np.float32)
-    expanded_grid = np.repeat(original_grid, 4, axis=-1)  # Now shape (15, 11, 4)
-    
-    obs = {
-        "grid": expanded_grid
-    }
-    
+    obs, _ = env.reset()
     done = False
 
     # Run the episode
@@ -36,19 +55,10 @@ while True:
         action, _ = model.predict(obs, deterministic=True)
 
         # Take action in the environment
-        next_obs_dict, reward, terminated, truncated, _ = env.step(action)
+        obs, reward, terminated, truncated, _ = env.step(action)
         done = terminated or truncated
 
-        # Prepare next observation (again expanding to 4 channels)
-        original_grid = np.array(next_obs_dict["grid"], dtype=np.float32)
-        obs = {
-            "grid": np.repeat(original_grid, 4, axis=-1)
-        }
-
-        # Render the game
-        env.render()
-
     print("Episode completed. Resetting environment...")
 
 # Close environment (never reached due to infinite loop)
-env.close()
\ No newline at end of file
+env.close()
@@ -0,0 +1,303 @@
+import multiprocessing as mp
+import os
+from multiprocessing import shared_memory
+
+import gymnasium as gym
+import numpy as np
+from stable_baselines3.common.vec_env import VecEnv
+
+import game_env  # registers CustomPlatformer-v0 in every process that imports this module
+
+# seconds a new worker may take to import everything and build its env before its first answer
+STARTUP_TIMEOUT = 120.0
+
+
+def _buffer_specs(num_envs, observation_space):
+    """(name, shape, dtype) of every shared array: observations, terminal observations, actions and step results"""
+    specs = []
+    for key, space in observation_space.spaces.items():
+        specs.append((f"obs.{key}", (num_envs,) + space.shape, space.dtype))
+        specs.append((f"terminal.{key}", (num_envs,) + space.shape, space.dtype))
+    specs += [("actions", (num_envs,), np.int64), ("reward", (num_envs,), np.float32),
+              ("terminated", (num_envs,), np.bool_), ("truncated", (num_envs,), np.bool_)]
+    return specs
+
+
+def _attach(blocks):
+    """NumPy views of shared memory blocks given as {name: (block_name, shape, dtype)}"""
+    handles, arrays = [], {}
+    for name, (block_name, shape, dtype) in blocks.items():
+        handle = shared_memory.SharedMemory(name=block_name)
+        handles.append(handle)
+        arrays[name] = np.ndarray(shape, dtype=dtype, buffer=handle.buf)
+    return handles, arrays
+
+
+def _write(arrays, prefix, index, obs):
+    for key, value in obs.items():
+        arrays[f"{prefix}.{key}"][index] = value
+
+
+def _worker(index, conn, blocks, env_id, env_kwargs):
+    """Runs one env, exchanging actions, observations, rewards and dones through shared memory
+
+    The pipe only carries short commands and acknowledgements, which hold the env's small info dict;
+    finished episodes restart here and leave their last observation in the terminal arrays.
+    """
+    # workers never open a window or play sound, whatever drivers the parent process uses
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
+    handles, arrays = _attach(blocks)
+    env = gym.make(env_id, **env_kwargs)
+    try:
+        while True:
+            command, data = conn.recv()
+            if command == "step":
+                obs, reward, terminated, truncated, info = env.step(int(arrays["actions"][index]))
+                arrays["reward"][index] = reward
+                arrays["terminated"][index] = terminated
+                arrays["truncated"][index] = truncated
+                if terminated or truncated:
+                    _write(arrays, "terminal", index, obs)
+                    obs, _ = env.reset()
+                _write(arrays, "obs", index, obs)
+                # the info of the step, so a finished episode reports the level it played
+                conn.send(info)
+            elif command == "reset":
+                obs, info = env.reset(seed=data)
+                _write(arrays, "obs", index, obs)
+                conn.send(info)
+            elif command == "get_attr":
+                conn.send(getattr(env.unwrapped, data))
+            elif command == "set_attr":
+                conn.send(setattr(env.unwrapped, *data))
+            elif command == "env_method":
+                name, args, kwargs = data
+                conn.send(getattr(env.unwrapped, name)(*args, **kwargs))
+            elif command == "is_wrapped":
+                conn.send(isinstance(env, data) or any(isinstance(wrapper, data) for wrapper in _wrappers(env)))
+            elif command == "close":
+                break
+    except (KeyboardInterrupt, EOFError, ConnectionResetError):
+        pass
+    finally:
+        env.close()
+        for handle in handles:
+            handle.close()
+
+
+def _wrappers(env):
+    while isinstance(env, gym.Wrapper):
+        yield env
+        env = env.env
+
+
+class WorkerFailure(RuntimeError):
+    """A worker process kept dying or stopped answering"""
+
+    def __init__(self, index, reason):
+        super().__init__(f"env {index}: {reason}")
+        self.index = index
+
+
+class SharedMemoryVecEnv(VecEnv):
+    """num_envs PlatformerEnv instances, one per worker process, as one stable-baselines3 VecEnv
+
+    Actions, observations, rewards and dones live in multiprocessing shared memory, so the pipes to the
+    workers only carry a command and the env's small info dict per step. Episodes restart inside the workers
+    like SubprocVecEnv. A worker that dies, or does not answer within timeout seconds, is started again and
+    its episode is reported as truncated with info["worker_restarted"]; after max_restarts restarts of one
+    env, WorkerFailure is raised.
+    """
+
+    def __init__(self, num_envs, env_id="CustomPlatformer-v0", env_kwargs=None, start_method="forkserver", seed=None,
+                 timeout=30.0, max_restarts=10):
+        self.env_id = env_id
+        self.env_kwargs = dict(render_mode=None, **(env_kwargs or {}))
+        self.base_seed = seed
+        self.timeout = timeout
+        self.max_restarts = max_restarts
+        self.restarts = 0
+        self.worker_restarts = [0] * num_envs
+        self.context = mp.get_context(start_method)
+
+        # the parent only builds an env to read its spaces
+        probe = gym.make(env_id, **self.env_kwargs)
+        observation_space, action_space = probe.observation_space, probe.action_space
+        probe.close()
+
+        self.blocks, self.handles, self.arrays = {}, [], {}
+        for name, shape, dtype in _buffer_specs(num_envs, observation_space):
+            size = max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1)
+            handle = shared_memory.SharedMemory(create=True, size=size)
+            self.handles.append(handle)
+            self.blocks[name] = (handle.name, shape, dtype)
+            self.arrays[name] = np.ndarray(shape, dtype=dtype, buffer=handle.buf)
+        self.keys = list(observation_space.spaces)
+
+        self.processes = [None] * num_envs
+        self.conns = [None] * num_envs
+        self.starting = set()
+        self.crashed = set()
+        for index in range(num_envs):
+            self._start(index)
+        self.closed = False
+        super().__init__(num_envs, observation_space, action_space)
+
+    def _start(self, index):
+        parent_conn, child_conn = self.context.Pipe()
+        process = self.context.Process(target=_worker, args=(index, child_conn, self.blocks, self.env_id, self.env_kwargs),
+                                       daemon=True)
+        process.start()
+        # the parent drops its copy of the child end, so a dead worker shows up as EOFError on recv
+        child_conn.close()
+        self.processes[index] = process
+        self.conns[index] = parent_conn
+        self.starting.add(index)
+
+    def _recv(self, index):
+        """The answer of worker index; EOFError if it died or did not answer within timeout, which ends it"""
+        conn = self.conns[index]
+        timeout = STARTUP_TIMEOUT if index in self.starting else self.timeout
+        if not conn.poll(timeout):
+            self.processes[index].kill()
+            raise EOFError(f"worker {index} did not answer within {timeout} s")
+        self.starting.discard(index)
+        return conn.recv()
+
+    def _restart(self, index):
+        """Replaces a dead or hung worker with a fresh one, starts its first episode and returns its reset info"""
+        while True:
+            if self.worker_restarts[index] >= self.max_restarts:
+                raise WorkerFailure(index, f"worker died or hung {self.worker_restarts[index] + 1} times, "
+                                           f"giving up after {self.max_restarts} restarts")
+            self.conns[index].close()
+            if self.processes[index].is_alive():
+                self.processes[index].kill()
+            self.processes[index].join(timeout=1)
+            self.restarts += 1
+            self.worker_restarts[index] += 1
+            self._start(index)
+            seed = None if self.base_seed is None else self.base_seed + index + self.restarts * self.num_envs
+            try:
+                self.conns[index].send(("reset", seed))
+                return self._recv(index)
+            except (EOFError, BrokenPipeError, ConnectionResetError):
+                continue
+
+    def _obs(self):
+        return {key: self.arrays[f"obs.{key}"].copy() for key in self.keys}
+
+    def reset(self):
+        failed = set()
+        for index, conn in enumerate(self.conns):
+            seed = self._seeds[index]
+            if seed is None and self.base_seed is not None:
+                seed = self.base_seed + index
+            try:
+                conn.send(("reset", seed))
+            except (BrokenPipeError, ConnectionResetError):
+                failed.add(index)
+        for index in range(self.num_envs):
+            if index in failed:
+                continue
+            try:
+                self._recv(index)
+            except (EOFError, ConnectionResetError):
+                failed.add(index)
+        for index in sorted(failed):
+            self._restart(index)
+        self._reset_seeds()
+        self._reset_options()
+        return self._obs()
+
+    def step_async(self, actions):
+        self.arrays["actions"][:] = np.asarray(actions).reshape(self.num_envs)
+        for index, conn in enumerate(self.conns):
+            try:
+                conn.send(("step", None))
+            except (BrokenPipeError, ConnectionResetError):
+                self.crashed.add(index)
+
+    def step_wait(self):
+        infos = [{} for _ in range(self.num_envs)]
+        for index in range(self.num_envs):
+            if index in self.crashed:
+                continue
+            try:
+                infos[index] = dict(self._recv(index))
+            except (EOFError, ConnectionResetError):
+                self.crashed.add(index)
+        crashed = sorted(self.crashed)
+        self.crashed.clear()
+
+        if crashed:
+            # the crashed episode ends where it was last observed
+            for index in crashed:
+                for key in self.keys:
+                    self.arrays[f"terminal.{key}"][index] = self.arrays[f"obs.{key}"][index]
+                self.arrays["reward"][index] = 0
+                self.arrays["terminated"][index] = False
+                self.arrays["truncated"][index] = True
+                # the info of the episode the new worker started, as the crashed one has none to give
+                infos[index] = dict(self._restart(index))
+
+        terminated = self.arrays["terminated"].copy()
+        truncated = self.arrays["truncated"].copy()
+        dones = terminated | truncated
+        for index in np.flatnonzero(dones):
+            infos[index]["terminal_observation"] = {key: self.arrays[f"terminal.{key}"][index].copy() for key in self.keys}
+            infos[index]["TimeLimit.truncated"] = bool(truncated[index] and not terminated[index])
+        for index in crashed:
+            infos[index]["worker_restarted"] = True
+        return self._obs(), self.arrays["reward"].copy(), dones, infos
+
+    def close(self):
+        if self.closed:
+            return
+        for conn, process in zip(self.conns, self.processes):
+            if process.is_alive():
+                try:
+                    conn.send(("close", None))
+                except (BrokenPipeError, OSError):
+                    pass
+        for conn, process in zip(self.conns, self.processes):
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+            conn.close()
+        for handle in self.handles:
+            handle.close()
+            handle.unlink()
+        self.closed = True
+
+    def _indices(self, indices):
+        if indices is None:
+            return range(self.num_envs)
+        if isinstance(indices, int):
+            return [indices]
+        return indices
+
+    def _call(self, command, data, indices):
+        indices = self._indices(indices)
+        results = []
+        try:
+            for index in indices:
+                self.conns[index].send((command, data))
+            for index in indices:
+                results.append(self._recv(index))
+        except (EOFError, BrokenPipeError, ConnectionResetError) as error:
+            raise WorkerFailure(index, f"worker died or hung during {command}") from error
+        return results
+
+    def get_attr(self, attr_name, indices=None):
+        return self._call("get_attr", attr_name, indices)
+
+    def set_attr(self, attr_name, value, indices=None):
+        self._call("set_attr", (attr_name, value), indices)
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        return self._call("env_method", (method_name, method_args, method_kwargs), indices)
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return self._call("is_wrapped", wrapper_class, indices)
@@ -0,0 +1,568 @@
+import os
+import struct
+import numpy as np
+from settings import tile_size, screen_height, screen_width, control_ai
+from level_compiler import load_level_bundle
+
+# gameplay constants, mirrored from Player, Enemy, Coin, Palm and Level
+GRAVITY = 0.8
+JUMP_SPEED = -16
+STOMP_SPEED = -15
+MAX_FALL_VELOCITY = 20
+RUN_SPEED = 8
+SCROLL_SPEED = 8
+ENEMY_SPEED = 4
+ANIMATION_SPEED = 0.15
+COLLISION_WIDTH = 50
+INVINCIBILITY_DURATION = 500
+DAMAGE = 10
+MAX_HEALTH = 100
+COIN_VALUES = {0: 5,1: 1}
+COIN_PATHS = {0: '../graphics/coins/gold',1: '../graphics/coins/silver'}
+PALM_OFFSETS = {0: 38,1: 64}
+
+STATUSES = ('idle','run','jump','fall')
+IDLE, RUN, JUMP, FALL = range(len(STATUSES))
+
+# never overlaps anything, pads ragged per-level arrays
+NO_RECT = (-10 ** 9,-10 ** 9,0,0)
+
+# the first tile column and row of the solid lookup blocks, far enough out to hold everything above and left of a level
+FIRST_COLUMN = -2
+FIRST_ROW = -3
+
+def image_size(path):
+	"""Width and height of a png, read from its header so no image library is needed"""
+	with open(path,'rb') as f:
+		header = f.read(24)
+	return struct.unpack('>II',header[16:24])
+
+def folder_sizes(path):
+	# same traversal as support.import_folder, so frame i here is frame i there
+	sizes = []
+	for _,__,image_files in os.walk(path):
+		for image in image_files:
+			sizes.append(image_size(path + '/' + image))
+	return sizes
+
+def frame_ticks(frame):
+	"""Milliseconds on a 60 fps frame clock, the deterministic stand-in for pygame.time.get_ticks"""
+	return frame * 1000 // 60
+
+def rect_overlap(ax,ay,aw,ah,bx,by,bw,bh):
+	"""Rect.colliderect over broadcast arrays"""
+	return (ax < bx + bw) & (bx < ax + aw) & (ay < by + bh) & (by < ay + ah)
+
+def edge_overlap(left,top,right,bottom,other_left,other_top,other_right,other_bottom):
+	"""rect_overlap for rects given by their edges"""
+	return (left < other_right) & (other_left < right) & (top < other_bottom) & (other_top < bottom)
+
+def round_coordinate(values):
+	# pygame rounds float coordinates half away from zero when they are assigned to a Rect
+	return np.where(values >= 0,np.floor(values + 0.5),np.ceil(values - 0.5)).astype(np.int64)
+
+def layer_cells(layout):
+	"""(x, y, tile id) of every used cell, in the row-major order Level.create_tile_group adds sprites"""
+	for row_index, col_index in zip(*np.nonzero(layout != -1)):
+		yield int(col_index) * tile_size, int(row_index) * tile_size, int(layout[row_index,col_index])
+
+def rect_array(rects):
+	return np.array(list(rects) or [NO_RECT],dtype = np.int64).reshape(-1,4)
+
+def pad_stack(arrays,fill):
+	"""Stacks arrays along a new first axis, padding the smaller ones with fill"""
+	shape = tuple(max(sizes) for sizes in zip(*(array.shape for array in arrays)))
+	stacked = np.empty((len(arrays),) + shape,dtype = arrays[0].dtype)
+	stacked[...] = fill
+	for index, array in enumerate(arrays):
+		stacked[(index,) + tuple(slice(length) for length in array.shape)] = array
+	return stacked
+
+class PlayerFrames:
+	"""Sizes of the character animation frames, which is all the physics needs from them"""
+	def __init__(self,character_path = '../graphics/character/'):
+		sizes = [folder_sizes(character_path + status) for status in STATUSES]
+		self.counts = np.array([len(frames) for frames in sizes])
+		self.sizes = pad_stack([np.array(frames,dtype = np.int64) for frames in sizes],0)
+		self.idle_size = tuple(sizes[IDLE][0])
+
+class LevelArrays:
+	"""Static geometry of one level as integer rect arrays, kept in the order of Level's sprite groups"""
+	def __init__(self,bundle):
+		self.bundle = bundle
+		self.level_index = bundle.level_index
+		self.terrain = bundle.layer('terrain')
+		self.height = bundle.height
+		self.width = bundle.width
+		self.start = bundle.start
+		self.goal = bundle.goal
+
+		# solids in the order Level builds its collision grid: terrain, crates, foreground palms
+		crate_width, crate_height = image_size('../graphics/terrain/crate.png')
+		solids = [(x,y,tile_size,tile_size) for x,y,_ in layer_cells(bundle.layer('terrain'))]
+		solids += [(x,y + tile_size - crate_height,crate_width,crate_height) for x,y,_ in layer_cells(bundle.layer('crates'))]
+		solids += [(x,y - PALM_OFFSETS[val],tile_size,tile_size) for x,y,val in layer_cells(bundle.layer('fg palms')) if val in PALM_OFFSETS]
+		self.solids = rect_array(solids)
+
+		coins = [(x,y,val) for x,y,val in layer_cells(bundle.layer('coins')) if val in COIN_VALUES]
+		coin_sizes = {val: folder_sizes(path)[0] for val, path in COIN_PATHS.items()}
+		self.coins = rect_array((x + tile_size // 2 - coin_sizes[val][0] // 2,y + tile_size // 2 - coin_sizes[val][1] // 2) + coin_sizes[val] for x,y,val in coins)
+		self.coin_values = np.array([COIN_VALUES[val] for _,__,val in coins] or [0],dtype = np.int64)
+
+		enemy_height = folder_sizes('../graphics/enemy/run')[0][1]
+		self.enemies = rect_array((x,y + tile_size - enemy_height,tile_size,tile_size) for x,y,_ in layer_cells(bundle.layer('enemies')))
+		self.constraints = rect_array((x,y,tile_size,tile_size) for x,y,_ in layer_cells(bundle.layer('constraints')))
+
+		self.blocks = self.solid_blocks()
+
+	def solid_blocks(self):
+		"""Solid indices overlapping each block of 4x4 tiles, by block column and row, padded with -1
+
+		A collision rect plus the one tile margin Level.nearby_collidable_sprites adds never spans more
+		than four tiles either way, so the block at its top left tile holds every solid it can touch.
+		Queries beyond the table are clamped to its border blocks, which hold everything out there.
+		"""
+		left, top = self.solids[:,0], self.solids[:,1]
+		right, bottom = left + self.solids[:,2], top + self.solids[:,3]
+		used = self.solids[:,2] > 0
+		blocks = [[np.flatnonzero(used & (left < (column + 4) * tile_size) & (right > column * tile_size) & (top < (row + 4) * tile_size) & (bottom > row * tile_size))
+			for row in range(FIRST_ROW,self.height + 2)]
+			for column in range(FIRST_COLUMN,self.width + 1)]
+		size = max(1,max(len(block) for column in blocks for block in column))
+		table = np.full((len(blocks),len(blocks[0]),size),-1,dtype = np.int64)
+		for column, column_blocks in enumerate(blocks):
+			for row, block in enumerate(column_blocks):
+				table[column,row,:len(block)] = block
+		return table
+
+class Simulation:
+	"""N independent platformer worlds stepped together as arrays, reproducing Game.run without pygame
+
+	Every world plays one of the preloaded levels; entries of levels may be level indices or LevelBundles.
+	Time is a 60 fps frame clock, so invincibility lasts a fixed number of frames.
+	"""
+	def __init__(self,num_worlds = 1,levels = (1,),world_levels = None):
+		self.num_worlds = num_worlds
+		self.levels = [LevelArrays(load_level_bundle(level) if isinstance(level,int) else level) for level in levels]
+		self.frames = PlayerFrames()
+		self.collision_height = self.frames.idle_size[1]
+
+		# every level's arrays stacked, the extra trailing solid is the target of padded block slots
+		self.solids = pad_stack([np.vstack([level.solids,[NO_RECT]]) for level in self.levels],NO_RECT)
+		self.no_solid = self.solids.shape[1] - 1
+		self.solids[:,self.no_solid] = NO_RECT
+		blocks = pad_stack([level.blocks for level in self.levels],-1)
+		blocks[blocks == -1] = self.no_solid
+		# every block's solids as left, top, right and bottom rows, flattened over (level, column, row) so a lookup is one take
+		self.block_shape = blocks.shape[1:3]
+		rects = self.solids[np.arange(len(self.levels))[:,None,None,None],blocks]
+		edges = np.concatenate([rects[...,:2],rects[...,:2] + rects[...,2:]],axis = -1)
+		self.block_solids = edges.transpose(0,1,2,4,3).reshape(-1,4,blocks.shape[3]).astype(np.int32)
+		self.coin_rects = pad_stack([level.coins for level in self.levels],NO_RECT)
+		self.coin_values = pad_stack([level.coin_values for level in self.levels],0)
+		self.enemy_rects = pad_stack([level.enemies for level in self.levels],NO_RECT)
+		self.constraint_rects = pad_stack([level.constraints for level in self.levels],NO_RECT)
+		self.starts = np.array([level.start for level in self.levels],dtype = np.int64)
+		self.goals = np.array([level.goal for level in self.levels],dtype = np.int64)
+		self.last_column = np.array([level.width for level in self.levels])
+		self.last_row = np.array([level.height + 1 for level in self.levels])
+
+		# Player.update reads its own input after the agent's, which is how settings.control_ai steers it
+		self.override = 3 if control_ai is None else int(control_ai)
+
+		n = num_worlds
+		self.world_level = np.zeros(n,dtype = np.int64) if world_levels is None else np.array(world_levels,dtype = np.int64)
+		self.frame = np.zeros(n,dtype = np.int64)
+
+		# player: collision rect, drawn rect, movement and status
+		self.collision_x = np.zeros(n,dtype = np.int64)
+		self.collision_y = np.zeros(n,dtype = np.int64)
+		self.rect_x = np.zeros(n,dtype = np.int64)
+		self.rect_y = np.zeros(n,dtype = np.int64)
+		self.rect_w = np.zeros(n,dtype = np.int64)
+		self.rect_h = np.zeros(n,dtype = np.int64)
+		self.direction_x = np.zeros(n)
+		self.direction_y = np.zeros(n)
+		self.speed = np.zeros(n,dtype = np.int64)
+		self.status = np.zeros(n,dtype = np.int64)
+		self.frame_index = np.zeros(n)
+		self.facing_right = np.zeros(n,dtype = bool)
+		self.on_ground = np.zeros(n,dtype = bool)
+		self.on_ceiling = np.zeros(n,dtype = bool)
+		self.on_left = np.zeros(n,dtype = bool)
+		self.on_right = np.zeros(n,dtype = bool)
+		self.previous_x = np.zeros(n,dtype = np.int64)
+		self.previous_y = np.zeros(n,dtype = np.int64)
+		self.velocity_x = np.zeros(n,dtype = np.int64)
+		self.velocity_y = np.zeros(n,dtype = np.int64)
+		self.invincible = np.zeros(n,dtype = bool)
+		self.hurt_time = np.zeros(n,dtype = np.int64)
+
+		# level and game state
+		self.ground = np.zeros(n,dtype = bool)
+		self.camera_x = np.zeros(n,dtype = np.int64)
+		self.world_shift = np.zeros(n,dtype = np.int64)
+		self.health = np.zeros(n,dtype = np.int64)
+		self.coins = np.zeros(n,dtype = np.int64)
+		self.coin_alive = np.zeros((n,self.coin_rects.shape[1]),dtype = bool)
+		self.enemy_x = np.zeros((n,self.enemy_rects.shape[1]),dtype = np.int64)
+		self.enemy_speed = np.zeros((n,self.enemy_rects.shape[1]),dtype = np.int64)
+		self.enemy_alive = np.zeros((n,self.enemy_rects.shape[1]),dtype = bool)
+
+		self.reset()
+
+	def select(self,worlds):
+		"""Normalises None (every world), a boolean mask or indices to an index array"""
+		if worlds is None:
+			return np.arange(self.num_worlds)
+		worlds = np.asarray(worlds)
+		return np.flatnonzero(worlds) if worlds.dtype == bool else worlds
+
+	def reset(self,worlds = None,levels = None):
+		"""Game.reset for the selected worlds, optionally switching them to other preloaded levels"""
+		worlds = self.select(worlds)
+		if levels is not None:
+			self.world_level[worlds] = levels
+		level = self.world_level[worlds]
+		start_x, start_y = self.starts[level].T
+		idle_w, idle_h = self.frames.idle_size
+
+		self.frame_index[worlds] = 0
+		self.rect_x[worlds] = start_x
+		self.rect_y[worlds] = start_y
+		self.rect_w[worlds] = idle_w
+		self.rect_h[worlds] = idle_h
+		self.previous_x[worlds] = start_x
+		self.previous_y[worlds] = start_y
+		self.velocity_x[worlds] = 0
+		self.velocity_y[worlds] = 0
+		self.direction_x[worlds] = 0
+		self.direction_y[worlds] = 0
+		self.speed[worlds] = RUN_SPEED
+		self.collision_x[worlds] = start_x
+		self.collision_y[worlds] = start_y
+		self.status[worlds] = IDLE
+		self.facing_right[worlds] = True
+		self.on_ground[worlds] = False
+		self.on_ceiling[worlds] = False
+		self.on_left[worlds] = False
+		self.on_right[worlds] = False
+		self.invincible[worlds] = False
+		self.hurt_time[worlds] = 0
+
+		self.ground[worlds] = False
+		self.camera_x[worlds] = 0
+		self.world_shift[worlds] = 0
+		self.health[worlds] = MAX_HEALTH
+		self.coins[worlds] = 0
+		self.coin_alive[worlds] = self.coin_rects[level][:,:,2] > 0
+		self.enemy_x[worlds] = self.enemy_rects[level][:,:,0]
+		self.enemy_speed[worlds] = ENEMY_SPEED
+		self.enemy_alive[worlds] = self.enemy_rects[level][:,:,2] > 0
+
+	def settle(self,worlds = None):
+		"""Clears motion and runs one collision pass, as PlatformerEnv.reset does after restarting the game"""
+		worlds = self.select(worlds)
+		self.velocity_x[worlds] = 0
+		self.velocity_y[worlds] = 0
+		self.previous_x[worlds] = self.rect_x[worlds]
+		self.previous_y[worlds] = self.rect_y[worlds]
+		self.on_ground[worlds] = False
+		self.on_left[worlds] = False
+		self.on_right[worlds] = False
+		self.on_ceiling[worlds] = False
+		self.vertical_movement_collision(worlds)
+		self.horizontal_movement_collision(worlds)
+
+	def step(self,actions):
+		"""Advances every world by one frame: Player.get_input(action) followed by Game.run"""
+		self.frame += 1
+		self.apply_input(actions)
+
+		self.move_enemies()
+		self.apply_input(self.override)
+		self.update_player()
+		self.horizontal_movement_collision()
+		self.vertical_movement_collision()
+		self.check_player_ground()
+		self.scroll_x()
+		self.check_coin_collisions()
+		self.check_enemy_collisions()
+
+		# Game.run restarts the level once health runs out
+		dead = self.health <= 0
+		if dead.any():
+			self.reset(dead)
+
+	def apply_input(self,actions):
+		"""Player.get_input for the AI action of every world"""
+		actions = np.broadcast_to(actions,(self.num_worlds,))
+		left = actions == 0
+		right = actions == 1
+		jump = (actions == 2) & self.on_ground
+		self.direction_x[left] = -1
+		self.facing_right[left] = False
+		self.direction_x[right] = 1
+		self.facing_right[right] = True
+		self.direction_y[jump] = JUMP_SPEED
+		self.velocity_y[jump] = JUMP_SPEED
+		self.direction_x[~(left | right | jump)] = 0
+
+	def move_enemies(self):
+		"""Enemy.move plus Level.enemy_collision_reverse"""
+		self.enemy_x += np.where(self.enemy_alive,self.enemy_speed,0)
+		enemy_y = self.enemy_rects[self.world_level][:,:,1]
+		constraints = self.constraint_rects[self.world_level][:,None,:,:]
+		touching = rect_overlap(self.enemy_x[:,:,None],enemy_y[:,:,None],tile_size,tile_size,
+			constraints[...,0],constraints[...,1],constraints[...,2],constraints[...,3]).any(axis = 2)
+		self.enemy_speed = np.where(touching & self.enemy_alive,-self.enemy_speed,self.enemy_speed)
+
+	def update_player(self):
+		"""Player.update after get_input: status, animation frame and rect, invincibility and velocities"""
+		self.status = np.where(self.direction_y < 0,JUMP,np.where(self.direction_y > 1,FALL,np.where(self.direction_x != 0,RUN,IDLE)))
+
+		self.frame_index += ANIMATION_SPEED
+		self.frame_index[self.frame_index >= self.frames.counts[self.status]] = 0
+		size = self.frames.sizes[self.status,self.frame_index.astype(np.int64)]
+
+		# the frame is anchored on the collision rect's facing corner, then re-centred on that spot
+		left = np.where(self.facing_right,self.collision_x,self.collision_x + COLLISION_WIDTH - self.rect_w)
+		center = left + self.rect_w // 2
+		self.rect_w = size[:,0]
+		self.rect_h = size[:,1]
+		self.rect_x = center - self.rect_w // 2
+		self.rect_y = self.collision_y + self.collision_height - self.rect_h
+
+		self.invincible &= frame_ticks(self.frame) - self.hurt_time < INVINCIBILITY_DURATION
+
+		self.velocity_x = self.rect_x - self.previous_x
+		self.velocity_y = self.rect_y - self.previous_y
+		self.previous_x = self.rect_x.copy()
+		self.previous_y = self.rect_y.copy()
+
+	def nearby_solids(self,worlds,collision_x,collision_y):
+		"""Per slot (left, top, right, bottom) rows of the solids near each collision rect, in collision grid order
+
+		Slots are compacted so the first ones hold every world's candidates; padding never overlaps.
+		"""
+		level = self.world_level[worlds]
+		left = collision_x - tile_size
+		top = collision_y - tile_size
+		column = np.clip(left // tile_size,FIRST_COLUMN,self.last_column[level]) - FIRST_COLUMN
+		row = np.clip(top // tile_size,FIRST_ROW,self.last_row[level]) - FIRST_ROW
+		columns, rows = self.block_shape
+		candidates = self.block_solids[(level * columns + column) * rows + row]
+
+		# keep what the inflated query rect of Level.nearby_collidable_sprites touches
+		left, top = left.astype(np.int32)[:,None], top.astype(np.int32)[:,None]
+		near = edge_overlap(candidates[:,0],candidates[:,1],candidates[:,2],candidates[:,3],
+			left,top,left + (COLLISION_WIDTH + 2 * tile_size),top + (self.collision_height + 2 * tile_size))
+		counts = near.sum(axis = 1)
+		rows, slots = np.nonzero(near)
+		rank = np.arange(len(rows)) - (np.cumsum(counts) - counts)[rows]
+		compact = np.empty((counts.max(initial = 0),4,len(worlds)),dtype = np.int64)
+		compact[...] = NO_RECT[0]
+		compact[rank,:,rows] = candidates[rows,:,slots]
+		return compact
+
+	def horizontal_movement_collision(self,worlds = None):
+		worlds = self.select(worlds)
+		direction_x = self.direction_x[worlds]
+		collision_x = round_coordinate(self.collision_x[worlds] + direction_x * self.speed[worlds])
+		collision_y = self.collision_y[worlds]
+		on_left = self.on_left[worlds]
+		on_right = self.on_right[worlds]
+		moving_left = direction_x < 0
+		moving_right = direction_x > 0
+
+		# y stays put while resolving, so which solids a moving rect can hit in y is settled up front
+		solids = self.nearby_solids(worlds,collision_x,collision_y)
+		same_rows = (solids[:,1] < collision_y + self.collision_height) & (collision_y < solids[:,3]) & (direction_x != 0)
+		for slot in np.flatnonzero(same_rows.any(axis = 1)):
+			solid_left, solid_right = solids[slot,0], solids[slot,2]
+			hit = same_rows[slot] & (solid_left < collision_x + COLLISION_WIDTH) & (collision_x < solid_right)
+			left = hit & moving_left
+			right = hit & moving_right
+			collision_x = np.where(left,solid_right,np.where(right,solid_left - COLLISION_WIDTH,collision_x))
+			on_left |= left
+			on_right |= right
+		self.collision_x[worlds] = collision_x
+		self.on_left[worlds] = on_left
+		self.on_right[worlds] = on_right
+
+	def vertical_movement_collision(self,worlds = None):
+		worlds = self.select(worlds)
+
+		# Player.apply_gravity
+		previous_y = self.collision_y[worlds]
+		direction_y = self.direction_y[worlds] + GRAVITY
+		collision_y = round_coordinate(previous_y + direction_y)
+		velocity_y = collision_y - previous_y
+		capped = velocity_y > MAX_FALL_VELOCITY
+		velocity_y[capped] = MAX_FALL_VELOCITY
+		direction_y[capped] = MAX_FALL_VELOCITY
+
+		collision_x = self.collision_x[worlds]
+		on_ground = np.zeros(len(worlds),dtype = bool)
+		on_ceiling = self.on_ceiling[worlds]
+
+		# likewise x stays put, and a rect that is not moving vertically is never pushed
+		solids = self.nearby_solids(worlds,collision_x,collision_y)
+		same_columns = (solids[:,0] < collision_x + COLLISION_WIDTH) & (collision_x < solids[:,2]) & (direction_y != 0)
+		for slot in np.flatnonzero(same_columns.any(axis = 1)):
+			solid_top, solid_bottom = solids[slot,1], solids[slot,3]
+			hit = same_columns[slot] & (solid_top < collision_y + self.collision_height) & (collision_y < solid_bottom)
+			down = hit & (direction_y > 0)
+			up = hit & (direction_y < 0)
+			collision_y = np.where(down,solid_top - self.collision_height,np.where(up,solid_bottom,collision_y))
+			direction_y[down | up] = 0
+			on_ground |= down
+			on_ceiling |= up
+
+		self.collision_y[worlds] = collision_y
+		self.direction_y[worlds] = direction_y
+		self.velocity_y[worlds] = velocity_y
+		self.on_ground[worlds] = on_ground
+		self.on_ceiling[worlds] = on_ceiling
+
+		# player.rect.midbottom = player.collision_rect.midbottom
+		self.rect_x[worlds] = collision_x + COLLISION_WIDTH // 2 - self.rect_w[worlds] // 2
+		self.rect_y[worlds] = collision_y + self.collision_height - self.rect_h[worlds]
+
+	def check_player_ground(self):
+		"""Level.check_player_ground: is there anything in the strip under the player's feet"""
+		solids = self.nearby_solids(self.select(None),self.collision_x,self.collision_y)
+		feet = self.collision_y + self.collision_height
+		feet = edge_overlap(solids[:,0],solids[:,1],solids[:,2],solids[:,3],self.collision_x + 5,feet,self.collision_x + COLLISION_WIDTH - 5,feet + 5)
+		self.ground = feet.any(axis = 0)
+
+	def scroll_x(self):
+		player_x = self.rect_x + self.rect_w // 2 - self.camera_x
+		left = (player_x < screen_width / 4) & (self.direction_x < 0)
+		right = ~left & (player_x > screen_width - (screen_width / 4)) & (self.direction_x > 0)
+		self.world_shift = np.where(left,SCROLL_SPEED,np.where(right,-SCROLL_SPEED,0))
+		self.speed = np.where(left | right,0,RUN_SPEED)
+
+		self.camera_x -= self.world_shift
+		self.rect_x -= self.world_shift
+		self.collision_x -= self.world_shift
+
+	def pickup_rect(self):
+		# pickups are resolved where the player stood before this frame's scroll carried it along
+		return (self.rect_x + self.world_shift)[:,None], self.rect_y[:,None], self.rect_w[:,None], self.rect_h[:,None]
+
+	def check_coin_collisions(self):
+		coins = self.coin_rects[self.world_level]
+		hits = self.coin_alive & rect_overlap(*self.pickup_rect(),coins[...,0],coins[...,1],coins[...,2],coins[...,3])
+		self.coin_alive &= ~hits
+		self.coins += (hits * self.coin_values[self.world_level]).sum(axis = 1)
+
+	def check_enemy_collisions(self):
+		player_x, player_y, player_w, player_h = self.pickup_rect()
+		enemy_y = self.enemy_rects[self.world_level][:,:,1]
+		hits = self.enemy_alive & rect_overlap(player_x,player_y,player_w,player_h,self.enemy_x,enemy_y,tile_size,tile_size)
+		if not hits.any():
+			return
+
+		# resolved enemy by enemy because a stomp or a hit changes how the next contact plays out
+		player_bottom = (player_y + player_h)[:,0]
+		for enemy in np.flatnonzero(hits.any(axis = 0)):
+			hit = hits[:,enemy]
+			top = enemy_y[:,enemy]
+			stomp = hit & (top < player_bottom) & (player_bottom < top + tile_size // 2) & (self.direction_y >= 0)
+			self.direction_y[stomp] = STOMP_SPEED
+			self.enemy_alive[stomp,enemy] = False
+
+			damage = hit & ~stomp & ~self.invincible
+			self.health[damage] -= DAMAGE
+			self.invincible |= damage
+			self.hurt_time[damage] = frame_ticks(self.frame[damage])
+
+	def enemy_centres(self):
+		"""Centres of every world's enemies as (N, E, 2), with the (N, E) mask of those still alive"""
+		rects = self.enemy_rects[self.world_level]
+		centres = np.stack([self.enemy_x + rects[...,2] // 2,rects[...,1] + rects[...,3] // 2],axis = -1)
+		return centres, self.enemy_alive
+
+	def coin_centres(self):
+		"""Centres of every world's coins as (N, C, 2), with the (N, C) mask of those not picked up"""
+		rects = self.coin_rects[self.world_level]
+		return rects[...,:2] + rects[...,2:] // 2, self.coin_alive
+
+	def get_position(self):
+		"""(x, top, world_shift) of every world, the arrays behind Level.get_position"""
+		return self.rect_x, self.rect_y, self.world_shift
+
+	def goal_x(self):
+		return self.goals[self.world_level,0]
+
+	def reached_goal(self):
+		return self.rect_x >= self.goal_x()
+
+	def fell(self,limit = screen_height):
+		return self.rect_y > limit
+
+class SimulationLevel:
+	"""The Level queries PlatformerEnv makes, answered from one world of a Simulation"""
+	def __init__(self,simulation,world = 0):
+		self.simulation = simulation
+		self.world = world
+
+	def get_position(self):
+		sim, world = self.simulation, self.world
+		return (int(sim.rect_x[world]),int(sim.rect_y[world]),int(sim.world_shift[world]))
+
+	def get_position_of_start_and_goal(self):
+		level = self.simulation.levels[self.simulation.world_level[self.world]]
+		return {"player_start": level.start, "goal": level.goal}
+
+	def get_player_state(self):
+		sim, world = self.simulation, self.world
+		return {
+			'position': (int(sim.rect_x[world]),int(sim.rect_y[world])),
+			'velocity': (int(sim.velocity_x[world]),int(sim.velocity_y[world])),
+			'facing_right': bool(sim.facing_right[world]),
+			'on_ground': bool(sim.on_ground[world]),
+		}
+
+	def check_on_ground(self):
+		return bool(self.simulation.ground[self.world])
+
+	def get_enemy_centres(self):
+		centres, alive = self.simulation.enemy_centres()
+		return centres[self.world][alive[self.world]].tolist()
+
+	def get_coin_centres(self):
+		centres, alive = self.simulation.coin_centres()
+		return centres[self.world][alive[self.world]].tolist()
+
+class SimulationGame:
+	"""Stands in for main.Game when PlatformerEnv trains on the array simulation"""
+	def __init__(self,level = 1,preload = ()):
+		# every level the game may switch to is stacked into the simulation up front
+		self.level_ids = sorted({level,*preload})
+		self.simulation = Simulation(levels = self.level_ids,world_levels = [self.level_ids.index(level)])
+		self.level = SimulationLevel(self.simulation)
+		self.max_health = MAX_HEALTH
+		self.cur_level = level
+
+	def select_level(self,index):
+		self.simulation.reset(levels = [self.level_ids.index(index)])
+		self.cur_level = index
+
+	@property
+	def cur_health(self):
+		return int(self.simulation.health[0])
+
+	@property
+	def coins(self):
+		return int(self.simulation.coins[0])
+
+	def reset(self):
+		self.simulation.reset()
+
+	def begin_episode(self):
+		self.simulation.settle()
+
+	def step(self,action):
+		self.simulation.step(action)
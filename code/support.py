@@ -3,16 +3,87 @@ from settings import tile_size
 from os import walk
 import pygame
 
-def import_folder(path):
+# decoded assets are shared process wide; frames must be treated as read-only
+_asset_cache = {}
+_cache_stats = {'hits': 0, 'misses': 0}
+
+def _cached(key,loader):
+	if key in _asset_cache:
+		_cache_stats['hits'] += 1
+	else:
+		_cache_stats['misses'] += 1
+		_asset_cache[key] = loader()
+	return _asset_cache[key]
+
+def asset_cache_info():
+	"""Returns hit/miss counters and the number of cached assets"""
+	return {'hits': _cache_stats['hits'], 'misses': _cache_stats['misses'], 'entries': len(_asset_cache)}
+
+def clear_asset_cache():
+	_asset_cache.clear()
+	_cache_stats['hits'] = 0
+	_cache_stats['misses'] = 0
+
+class NullSound:
+	"""Stands in for pygame.mixer.Sound when nothing should be heard"""
+	def play(self,*args,**kwargs):
+		pass
+
+	def stop(self):
+		pass
+
+	def set_volume(self,value):
+		pass
+
+NULL_SOUND = NullSound()
+
+def convert_surface(surface,alpha = True):
+	# without a display mode (headless and offscreen runs) surfaces stay in their loaded pixel format
+	if pygame.display.get_surface() is None:
+		return surface
+	return surface.convert_alpha() if alpha else surface.convert()
+
+def _cached_surfaces(key,loader):
+	"""_cached for loaders that convert_surface: copies loaded before and after a window opens are kept apart"""
+	return _cached(key + (pygame.display.get_surface() is not None,),loader)
+
+def _load_folder(path):
 	surface_list = []
 
 	for _,__,image_files in walk(path):
 		for image in image_files:
 			full_path = path + '/' + image
-			image_surf = pygame.image.load(full_path).convert_alpha()
+			image_surf = convert_surface(pygame.image.load(full_path))
 			surface_list.append(image_surf)
 
-	return surface_list
+	return tuple(surface_list)
+
+def import_folder(path):
+	return _cached_surfaces(('folder',path),lambda: _load_folder(path))
+
+def _frame_variant(frame,flipped,alpha):
+	frame = pygame.transform.flip(frame,True,False) if flipped else frame.copy()
+	frame.set_alpha(alpha)
+	return frame
+
+def import_folder_variant(path,flipped = False,alpha = 255):
+	"""The frames of import_folder(path), mirrored horizontally and/or faded, prepared once and shared"""
+	if not flipped and alpha == 255:
+		return import_folder(path)
+	return _cached_surfaces(('folder variant',path,flipped,alpha),lambda: tuple(_frame_variant(frame,flipped,alpha) for frame in import_folder(path)))
+
+def import_image(path,alpha = True):
+	if alpha:
+		return _cached_surfaces(('image',path),lambda: convert_surface(pygame.image.load(path)))
+	return _cached_surfaces(('opaque image',path),lambda: convert_surface(pygame.image.load(path),alpha = False))
+
+def import_sound(path,muted = False):
+	if muted:
+		return NULL_SOUND
+	return _cached(('sound',path),lambda: pygame.mixer.Sound(path))
+
+def import_font(path,size):
+	return _cached(('font',path,size),lambda: pygame.font.Font(path,size))
 
 def import_csv_layout(path):
 	terrain_map = []
@@ -22,8 +93,8 @@ def import_csv_layout(path):
 			terrain_map.append(list(row))
 		return terrain_map
 
-def import_cut_graphics(path):
-	surface = pygame.image.load(path).convert_alpha()
+def _cut_graphics(path):
+	surface = convert_surface(pygame.image.load(path))
 	tile_num_x = int(surface.get_size()[0] / tile_size)
 	tile_num_y = int(surface.get_size()[1] / tile_size)
 
@@ -36,4 +107,7 @@ def import_cut_graphics(path):
 			new_surf.blit(surface,(0,0),pygame.Rect(x,y,tile_size,tile_size))
 			cut_tiles.append(new_surf)
 
-	return cut_tiles
+	return tuple(cut_tiles)
+
+def import_cut_graphics(path):
+	return _cached_surfaces(('cut',path),lambda: _cut_graphics(path))
@@ -12,9 +12,7 @@ done = False
 for _ in range(1000):
     action = env.action_space.sample()  # Random action
     # Now unpack 5 values from step()
-    obs, reward, terminated, truncated, info = env.step(action)
-    
-    env.render()  # Render the frame
+    obs, reward, terminated, truncated, info = env.step(action)  # step renders the frame in human mode
     
     # Check if episode is done (either terminated or truncated)
     if terminated or truncated:
@@ -0,0 +1,107 @@
+import os
+import subprocess
+import sys
+
+os.environ["SDL_VIDEODRIVER"] = "dummy"
+os.environ["SDL_AUDIODRIVER"] = "dummy"
+
+import numpy as np
+
+from game_env import PlatformerEnv
+from geometry import GeometryIndex
+from level_compiler import load_level_bundle, playable_levels
+from settings import tile_size
+from vec_env import PlatformerVecEnv
+
+STEPS = 300
+
+
+def copies(obs):
+    return {key: np.array(value) for key, value in obs.items()}
+
+
+def assert_unchanged(kept, obs, step):
+    for key, value in kept.items():
+        assert np.array_equal(obs[key], value), f"step {step}: {key} of the previous observation changed"
+
+
+def test_stacked_observations_survive_later_steps():
+    """SB3 stores an observation in its rollout buffer only after the next step, so stepping must not touch it"""
+    env = PlatformerVecEnv(4, frame_stack=4, obs_features=True)
+    env.seed(0)
+    rng = np.random.default_rng(0)
+    obs, terminal = env.reset(), []
+    for step in range(STEPS):
+        kept = [(copies(value), value) for value in [obs] + terminal]
+        obs, _, _, infos = env.step(rng.integers(0, 4, size=env.num_envs))
+        for before, after in kept:
+            assert_unchanged(before, after, step)
+        terminal = [info["terminal_observation"] for info in infos if "terminal_observation" in info]
+
+
+def test_single_env_stacked_observations_survive_later_steps():
+    env = PlatformerEnv(render_mode=None, frame_stack=4)
+    obs, _ = env.reset(seed=0)
+    for step in range(STEPS):
+        kept = copies(obs)
+        next_obs, _, terminated, truncated, _ = env.step(env.action_space.sample())
+        assert_unchanged(kept, obs, step)
+        if terminated or truncated:
+            # DummyVecEnv keeps the terminal observation across the reset
+            kept = copies(next_obs)
+            obs, _ = env.reset()
+            assert_unchanged(kept, next_obs, step)
+        else:
+            obs = next_obs
+
+
+# run in a fresh interpreter without the dummy drivers this module sets for itself
+HEADLESS_THEN_HUMAN = """
+import os
+import pygame
+from game_env import PlatformerEnv
+# importing gymnasium already picks an audio driver
+drivers = {name: value for name, value in os.environ.items() if name.startswith("SDL_")}
+env = PlatformerEnv()
+env.reset(seed=0)
+env.step(0)
+assert {name: value for name, value in os.environ.items() if name.startswith("SDL_")} == drivers, "a headless env set SDL drivers"
+assert not pygame.display.get_init(), "a headless env initialized the display"
+if os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"):
+    human = PlatformerEnv(render_mode="human")
+    assert pygame.display.get_driver() != "dummy", "the human env got no window"
+    human.close()
+"""
+
+
+def test_headless_env_leaves_display_to_a_later_human_env():
+    environment = {name: value for name, value in os.environ.items() if not name.startswith("SDL_")}
+    result = subprocess.run([sys.executable, "-c", HEADLESS_THEN_HUMAN], env=environment, capture_output=True,
+                            text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    assert result.returncode == 0, result.stderr
+
+
+def test_vec_env_plays_every_level_and_counts_episodes():
+    env = PlatformerVecEnv(16, seed=0)
+    assert env.levels == PlatformerEnv().levels
+    env.reset()
+    started = env.num_envs
+    for _ in range(STEPS):
+        _, _, dones, infos = env.step(np.full(env.num_envs, 1))
+        started += int(dones.sum())
+    assert set(info["level"] for info in infos) <= set(env.levels)
+    assert sum(env.level_episodes) == started
+    assert sum(infos[0]["level_episodes"].values()) == started - int(dones.sum())
+
+
+def test_batched_features_match_single_player_features():
+    """PlatformerVecEnv uses features_batch and PlatformerEnv features, including left of a level's start"""
+    geometry = GeometryIndex([load_level_bundle(level) for level in playable_levels()])
+    rng = np.random.default_rng(0)
+    level = rng.integers(len(geometry.levels), size=20000)
+    x = rng.integers(-1000, (geometry.widths[level] + 5) * tile_size)
+    y = rng.integers(-200, 900, size=len(level))
+    batch = geometry.features_batch(level, x, y)
+    for index in range(len(level)):
+        single = geometry.features(int(level[index]), int(x[index]), int(y[index]))
+        assert np.array_equal(batch[index], single), (int(level[index]), int(x[index]), int(y[index]))
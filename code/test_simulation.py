@@ -0,0 +1,146 @@
+import os
+import random
+
+os.environ["SDL_VIDEODRIVER"] = "dummy"
+os.environ["SDL_AUDIODRIVER"] = "dummy"
+
+import numpy as np
+import pygame
+
+from level import Level
+from level_compiler import LAYERS, LevelBundle, load_level_bundle
+from main import Game
+from player import Player
+from settings import control_ai
+from simulation import Simulation, frame_ticks
+
+STEPS = 1500
+SEEDS = (0, 1)
+
+
+def populated_bundle(level_index=2):
+    """A copy of a level with coins, enemies, constraints, crates and palms placed on its terrain"""
+    bundle = load_level_bundle(level_index)
+    layers = bundle.layers.copy()
+    layer = {name: layers[LAYERS.index(name)] for name in LAYERS}
+    for col in range(4, bundle.width - 2):
+        rows = np.nonzero(layer['terrain'][:, col] != -1)[0]
+        if len(rows) == 0 or rows[0] < 3:
+            continue
+        top = rows[0]
+        if col % 3 == 0:
+            layer['coins'][top - 2, col] = col % 2
+        if col % 11 == 5:
+            layer['enemies'][top - 1, col] = 0
+            layer['constraints'][top - 1, col - 3] = 0
+            layer['constraints'][top - 1, col + 3] = 0
+        if col % 13 == 7:
+            layer['crates'][top - 1, col] = 0
+        if col % 17 == 9:
+            layer['fg palms'][top - 1, col] = col % 2
+    return LevelBundle(level_index, layers, bundle.start, bundle.goal, 'populated')
+
+
+class PygameWorld:
+    """A headless Game on one bundle, on the frame clock the simulation uses"""
+
+    def __init__(self, bundle, repeat_action):
+        self.frame = 0
+        self.action = 3
+        self.game = Game(headless=True)
+        self.game.level = Level(bundle.level_index, self.game.screen, self.game.change_coins,
+                                self.game.change_health, headless=True, bundle=bundle)
+        player = self.game.level.player.sprite
+        player.get_ticks = lambda: frame_ticks(self.frame)
+        if repeat_action:
+            # the player's own per-frame input repeats the agent's action instead of settings.control_ai
+            player.get_input = lambda ai_action=None: Player.get_input(player, self.action)
+
+    def step(self, action):
+        self.frame += 1
+        self.action = action
+        self.game.step(action)
+
+    def state(self):
+        level = self.game.level
+        player = level.player.sprite
+        return (player.rect.x, player.rect.y, player.rect.w, player.rect.h,
+                player.collision_rect.x, player.collision_rect.y,
+                player.direction.x, player.direction.y, player.velocity_x, player.velocity_y,
+                player.on_ground, level.on_ground, player.invincible, level.camera_x, level.world_shift,
+                self.game.cur_health, self.game.coins, len(level.coin_sprites),
+                tuple(enemy.rect.x for enemy in level.enemy_sprites))
+
+
+def simulation_state(sim, world):
+    enemies = np.flatnonzero(sim.enemy_alive[world])
+    return (sim.rect_x[world], sim.rect_y[world], sim.rect_w[world], sim.rect_h[world],
+            sim.collision_x[world], sim.collision_y[world],
+            sim.direction_x[world], sim.direction_y[world], sim.velocity_x[world], sim.velocity_y[world],
+            sim.on_ground[world], sim.ground[world], sim.invincible[world], sim.camera_x[world], sim.world_shift[world],
+            sim.health[world], sim.coins[world], int(sim.coin_alive[world].sum()),
+            tuple(sim.enemy_x[world, enemies]))
+
+
+def replay(bundles, repeat_action=False):
+    """Steps one pygame Game per (bundle, seed) and a single Simulation holding all of them in lockstep"""
+    cases = [(bundle, seed) for bundle in bundles for seed in SEEDS]
+    worlds = [PygameWorld(bundle, repeat_action) for bundle, _ in cases]
+    sim = Simulation(len(cases), levels=[bundle for bundle, _ in cases], world_levels=range(len(cases)))
+    rngs = [random.Random(seed) for _, seed in cases]
+
+    for world in worlds:
+        world.game.begin_episode()
+    sim.settle()
+
+    episodes = 0
+    for step in range(STEPS):
+        actions = np.array([rng.choice((0, 1, 1, 1, 2, 2, 3)) for rng in rngs])
+        if repeat_action:
+            sim.override = actions
+        for world, action in zip(worlds, actions):
+            world.step(int(action))
+        sim.step(actions)
+
+        finished = []
+        for index, (world, (bundle, seed)) in enumerate(zip(worlds, cases)):
+            expected = world.state()
+            got = simulation_state(sim, index)
+            assert expected == got, f"level {bundle.level_index} ({bundle.source_hash[:9]}) seed {seed} step {step}:\n{expected}\n{got}"
+
+            # episodes end the way PlatformerEnv.step ends them
+            x, y, _ = world.game.level.get_position()
+            if y > 700 or x >= bundle.goal[0]:
+                world.game.reset()
+                world.game.begin_episode()
+                finished.append(index)
+        if finished:
+            sim.reset(finished)
+            sim.settle(finished)
+            episodes += len(finished)
+    return episodes
+
+
+def test_levels_match():
+    pygame.init()
+    bundles = [load_level_bundle(level_index) for level_index in range(4)]
+    print(f"levels 0-3: {replay(bundles)} episodes finished, trajectories identical")
+
+
+def test_populated_level_matches():
+    pygame.init()
+    print(f"populated level: {replay([populated_bundle()])} episodes finished, trajectories identical")
+
+
+def test_agent_steering_matches():
+    """With the player's own input repeating the agent's action, left moves and left scrolling are exercised too"""
+    pygame.init()
+    bundles = [load_level_bundle(2), populated_bundle()]
+    print(f"agent steering: {replay(bundles, repeat_action=True)} episodes finished, trajectories identical")
+
+
+if __name__ == "__main__":
+    print(f"settings.control_ai = {control_ai}")
+    test_levels_match()
+    test_populated_level_matches()
+    test_agent_steering_matches()
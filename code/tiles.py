@@ -1,5 +1,5 @@
 import pygame 
-from support import import_folder
+from support import import_folder, import_image
 
 class Tile(pygame.sprite.Sprite):
 	def __init__(self,size,x,y):
@@ -7,9 +7,6 @@ class Tile(pygame.sprite.Sprite):
 		self.image = pygame.Surface((size,size))
 		self.rect = self.image.get_rect(topleft = (x,y))
 
-	def update(self,shift):
-		self.rect.x += shift
-
 class StaticTile(Tile):
 	def __init__(self,size,x,y,surface):
 		super().__init__(size,x,y)
@@ -17,7 +14,7 @@ class StaticTile(Tile):
 
 class Crate(StaticTile):
 	def __init__(self,size,x,y):
-		super().__init__(size,x,y,pygame.image.load('../graphics/terrain/crate.png').convert_alpha())
+		super().__init__(size,x,y,import_image('../graphics/terrain/crate.png'))
 		offset_y = y + size
 		self.rect = self.image.get_rect(bottomleft = (x,offset_y))
 
@@ -34,9 +31,8 @@ class AnimatedTile(Tile):
 			self.frame_index = 0
 		self.image = self.frames[int(self.frame_index)]
 
-	def update(self,shift):
+	def update(self):
 		self.animate()
-		self.rect.x += shift
 
 class Coin(AnimatedTile):
 	def __init__(self,size,x,y,path,value):
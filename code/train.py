@@ -1,13 +1,19 @@
 import gymnasium as gym
 from stable_baselines3 import PPO
-from stable_baselines3.common.vec_env import DummyVecEnv, VecFrameStack, VecMonitor
+from stable_baselines3.common.vec_env import DummyVecEnv, VecMonitor
 from stable_baselines3.common.callbacks import BaseCallback
 import os
+import sys
 import numpy as np
 from game_env import PlatformerEnv, register_env
+from vec_env import PlatformerVecEnv
+from shm_vec_env import SharedMemoryVecEnv
 
 register_env()
 
+# observations per policy input; run_ai.py reads it back from the saved model
+FRAME_STACK = 4
+
 class SaveOnBestTrainingRewardCallback(BaseCallback):
     def __init__(self, check_freq: int, save_path: str, verbose: int = 1):
         super(SaveOnBestTrainingRewardCallback, self).__init__(verbose)
@@ -39,10 +45,21 @@ if __name__ == '__main__':
     log_dir = "../tensorboard_activity/ppo_tensorboard_improve_GPU/"
     os.makedirs(log_dir, exist_ok=True)
     
-    # Create environment with frame stacking
-    env = gym.make('CustomPlatformer-v0', render_mode=None)
-    env = DummyVecEnv([lambda: env])
-    env = VecFrameStack(env, n_stack=4)  # 4-frame stack
+    # python train.py [num_envs] [frame_skip] [parallel]: more than one env steps that many worlds of the
+    # array simulation at once, frame_skip repeats each action for that many game frames, and "parallel"
+    # runs num_envs PlatformerEnvs in as many worker processes instead
+    num_envs = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    frame_skip = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    parallel = len(sys.argv) > 3 and sys.argv[3] == "parallel"
+
+    # Create environment with frame stacking, done inside the envs so run_ai.py sees the same observations
+    if parallel:
+        env = SharedMemoryVecEnv(num_envs, env_kwargs=dict(frame_skip=frame_skip, frame_stack=FRAME_STACK))
+    elif num_envs > 1:
+        env = PlatformerVecEnv(num_envs, frame_skip=frame_skip, frame_stack=FRAME_STACK)
+    else:
+        env = gym.make('CustomPlatformer-v0', render_mode=None, frame_skip=frame_skip, frame_stack=FRAME_STACK)
+        env = DummyVecEnv([lambda: env])
     env = VecMonitor(env, log_dir)
     
     # Hyperparameters optimized for grid observations
@@ -51,7 +68,7 @@ if __name__ == '__main__':
         env,
         verbose=1,
         learning_rate=3e-4,
-        n_steps=2048,
+        n_steps=max(2048 // num_envs, 16),  # keep rollouts near 2048 steps however many envs collect them
         batch_size=128,
         n_epochs=10,
         gamma=0.99,
@@ -64,6 +81,9 @@ if __name__ == '__main__':
         )
     )
     
+    # saved with the model, so run_ai.py plays on the dynamics it was trained on
+    model.frame_skip = frame_skip
+
     # Callback
     callback = SaveOnBestTrainingRewardCallback(check_freq=1000, save_path=log_dir)
     
@@ -73,24 +93,25 @@ if __name__ == '__main__':
         model.learn(
             total_timesteps=4_000_000,  # Increased from 500k
             callback=callback,
-            tb_log_name="PPO",
+            tb_log_name="PPO_Parallel" if parallel else "PPO",
             progress_bar=True
         )
     except KeyboardInterrupt:
         print("Training interrupted - saving model...")
         model.save("../model/ppo_interrupted_improved_GPU")
+    finally:
+        env.close()
     
     # Save and test
     model.save("../model/ppo_platformer_improved_GPU")
     print("------------- Training Complete -------------")
     
     # Testing with rendering
-    test_env = gym.make('CustomPlatformer-v0', render_mode='human')
+    test_env = gym.make('CustomPlatformer-v0', render_mode='human', frame_skip=frame_skip, frame_stack=FRAME_STACK)
     obs = test_env.reset()[0]
     for _ in range(1000):
         action, _ = model.predict(obs, deterministic=True)
-        obs, _, terminated, truncated, _ = test_env.step(action)
-        test_env.render()
+        obs, _, terminated, truncated, _ = test_env.step(action)  # step renders the frame in human mode
         if terminated or truncated:
             obs = test_env.reset()[0]
     test_env.close()
\ No newline at end of file
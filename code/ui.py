@@ -1,31 +1,43 @@
 import pygame
+from support import import_image, import_font
 
 class UI:
-	def __init__(self,surface):
+	def __init__(self,surface,headless = False):
 
 		# setup 
 		self.display_surface = surface 
+		self.headless = headless
+		if self.headless:
+			return
 
 		# health 
-		self.health_bar = pygame.image.load('../graphics/ui/health_bar.png').convert_alpha()
+		self.health_bar = import_image('../graphics/ui/health_bar.png')
 		self.health_bar_topleft = (54,39)
 		self.bar_max_width = 152
 		self.bar_height = 4
 
 		# coins 
-		self.coin = pygame.image.load('../graphics/ui/coin.png').convert_alpha()
+		self.coin = import_image('../graphics/ui/coin.png')
 		self.coin_rect = self.coin.get_rect(topleft = (50,61))
-		self.font = pygame.font.Font('../graphics/ui/ARCADEPI.ttf',30)
+		self.font = import_font('../graphics/ui/ARCADEPI.ttf',30)
+		# the coin count is only rendered again when it changes
+		self.coin_amount = None
 
-	def show_health(self,current,full):
-		self.display_surface.blit(self.health_bar,(20,10))
+	def show_health(self,current,full,surface = None):
+		if self.headless: return
+		surface = surface or self.display_surface
+		surface.blit(self.health_bar,(20,10))
 		current_health_ratio = current / full
 		current_bar_width = self.bar_max_width * current_health_ratio
 		health_bar_rect = pygame.Rect(self.health_bar_topleft,(current_bar_width,self.bar_height))
-		pygame.draw.rect(self.display_surface,'#dc4949',health_bar_rect)
+		pygame.draw.rect(surface,'#dc4949',health_bar_rect)
 
-	def show_coins(self,amount):
-		self.display_surface.blit(self.coin,self.coin_rect)
-		coin_amount_surf = self.font.render(str(amount),False,'#33323d')
-		coin_amount_rect = coin_amount_surf.get_rect(midleft = (self.coin_rect.right + 4,self.coin_rect.centery))
-		self.display_surface.blit(coin_amount_surf,coin_amount_rect)
\ No newline at end of file
+	def show_coins(self,amount,surface = None):
+		if self.headless: return
+		surface = surface or self.display_surface
+		surface.blit(self.coin,self.coin_rect)
+		if amount != self.coin_amount:
+			self.coin_amount = amount
+			self.coin_amount_surf = self.font.render(str(amount),False,'#33323d')
+			self.coin_amount_rect = self.coin_amount_surf.get_rect(midleft = (self.coin_rect.right + 4,self.coin_rect.centery))
+		surface.blit(self.coin_amount_surf,self.coin_amount_rect)
\ No newline at end of file
@@ -0,0 +1,209 @@
+import numpy as np
+from gymnasium import spaces
+from stable_baselines3.common.vec_env import VecEnv
+
+from geometry import FEATURES, GeometryIndex
+from level_compiler import playable_levels
+from observation import FrameStack, ObservationBuilder
+from simulation import Simulation
+
+
+class PlatformerVecEnv(VecEnv):
+    """N platformer worlds as one stable-baselines3 VecEnv, stepped by a single Simulation call
+
+    Rewards and terminations use the same terms as PlatformerEnv.step, episodes are truncated after
+    max_episode_steps like the registered env, and finished worlds restart on a level drawn from levels, every
+    playable one by default. Infos carry the level and level_episodes of PlatformerEnv._info.
+    frame_skip, obs_pool, obs_channels, obs_features and frame_stack repeat actions, pool grids, pick grid
+    channels, add geometry features and stack observations as in PlatformerEnv.
+    Unlike PlatformerEnv, each world observes the terrain of the level it is playing.
+    """
+
+    render_mode = None
+
+    def __init__(self, num_envs=64, levels=None, max_episode_steps=1000, seed=None, frame_skip=1, obs_pool=None,
+                 obs_channels=("terrain",), obs_features=False, frame_stack=1):
+        if frame_skip < 1:
+            raise ValueError("frame_skip must be at least 1")
+        if frame_stack < 1:
+            raise ValueError("frame_stack must be at least 1")
+        if obs_pool not in (None, "max", "sum"):
+            raise ValueError(f"unknown obs_pool {obs_pool!r}")
+        self.levels = tuple(playable_levels() if levels is None else levels)
+        self.level_episodes = np.zeros(len(self.levels), dtype=np.int64)
+        self.max_episode_steps = max_episode_steps
+        self.frame_skip = frame_skip
+        self.obs_pool = obs_pool
+        self.np_random = np.random.default_rng(seed)
+        self.simulation = Simulation(num_envs, levels=self.levels)
+
+        bundles = [level.bundle for level in self.simulation.levels]
+        self.observer = ObservationBuilder(bundles, obs_channels)
+        self.geometry = GeometryIndex(bundles) if obs_features else None
+        self.player_x = np.zeros(num_envs, dtype=np.int64)
+        self.episode_steps = np.zeros(num_envs, dtype=np.int64)
+        self.actions = np.zeros(num_envs, dtype=np.int64)
+
+        grid_high = frame_skip if obs_pool == "sum" else 1
+        observation_space = spaces.Dict({
+            "grid": spaces.Box(low=0, high=grid_high, shape=self.observer.shape, dtype=np.float32)
+        })
+        if obs_features:
+            observation_space["features"] = spaces.Box(low=-np.inf, high=np.inf, shape=(len(FEATURES),),
+                                                       dtype=np.float32)
+        # the space of one frame, which the stack (if any) repeats along the last axis
+        self.frame_space = observation_space
+        self.frame_stack = frame_stack
+        self.stack = None
+        if frame_stack > 1:
+            self.stack = FrameStack(observation_space, frame_stack, num_envs)
+            observation_space = self.stack.space
+        super().__init__(num_envs, observation_space, spaces.Discrete(4))
+
+    def _restart(self, worlds):
+        """Starts fresh episodes in the selected worlds, each on a randomly chosen level"""
+        worlds = self.simulation.select(worlds)
+        choice = self.np_random.integers(len(self.levels), size=len(worlds))
+        self.simulation.reset(worlds, levels=choice)
+        self.level_episodes += np.bincount(choice, minlength=len(self.levels))
+        self.simulation.settle(worlds)
+        self.player_x[worlds] = self.simulation.rect_x[worlds]
+        self.episode_steps[worlds] = 0
+
+    def _get_obs(self):
+        sim = self.simulation
+        enemies = coins = None
+        if self.observer.uses_entities:
+            enemies, coins = sim.enemy_centres(), sim.coin_centres()
+        obs = {"grid": self.observer.observe_batch(sim.world_level, sim.rect_x, sim.rect_y, enemies, coins)}
+        if self.geometry is not None:
+            obs["features"] = self.geometry.features_batch(sim.world_level, sim.rect_x, sim.rect_y)
+        return obs
+
+    def reset(self):
+        if self._seeds[0] is not None:
+            self.np_random = np.random.default_rng(self._seeds[0])
+        self._reset_seeds()
+        self._reset_options()
+        self._restart(None)
+        obs = self._get_obs()
+        return obs if self.stack is None else self.stack.reset(obs)
+
+    def step_async(self, actions):
+        self.actions = np.asarray(actions, dtype=np.int64).reshape(self.num_envs)
+
+    def _run_frame(self, actions):
+        """Steps every world one frame and returns the PlatformerEnv.step reward and termination of each"""
+        sim = self.simulation
+        previous_x = self.player_x
+        sim.step(actions)
+
+        x, y, _ = sim.get_position()
+        self.player_x = x.copy()
+        on_ground = sim.ground
+
+        # the reward terms of PlatformerEnv.step, added in the same order
+        reward = (x - previous_x) / 10.0
+        reward -= 0.01
+        reward += np.where(actions == 2, np.where(on_ground, 0.1, -0.2), 0.0)
+        reward -= np.where(~on_ground & (sim.velocity_y < 0), 0.05, 0.0)
+        fell = y > 700
+        reward -= np.where(fell, 20, 0)
+        reached_goal = x >= sim.goal_x()
+        reward += np.where(reached_goal, 100, 0)
+        return reward, fell | reached_goal
+
+    def step_wait(self):
+        reward = np.zeros(self.num_envs)
+        terminated = np.zeros(self.num_envs, dtype=bool)
+        terminal = {key: np.zeros((self.num_envs,) + space.shape, dtype=np.float32)
+                    for key, space in self.frame_space.spaces.items()}
+        pooled_grid = None
+
+        for _ in range(self.frame_skip):
+            # worlds whose episode ended earlier in the repeat keep stepping but no longer count
+            frame_reward, frame_terminated = self._run_frame(self.actions)
+            reward += np.where(terminated, 0.0, frame_reward)
+            frame_obs = None
+            if self.obs_pool is not None:
+                frame_obs = self._get_obs()
+                grid = frame_obs["grid"]
+                if pooled_grid is None:
+                    pooled_grid = grid
+                elif self.obs_pool == "max":
+                    pooled_grid = np.where(terminated[:, None, None, None], pooled_grid, np.maximum(pooled_grid, grid))
+                else:
+                    pooled_grid = np.where(terminated[:, None, None, None], pooled_grid, pooled_grid + grid)
+                frame_obs["grid"] = pooled_grid
+
+            ended = frame_terminated & ~terminated
+            if ended.any():
+                if frame_obs is None:
+                    frame_obs = self._get_obs()
+                for key, value in frame_obs.items():
+                    terminal[key][ended] = value[ended]
+                terminated |= ended
+                if terminated.all():
+                    break
+
+        self.episode_steps += 1
+        truncated = self.episode_steps >= self.max_episode_steps
+        dones = terminated | truncated
+        obs = self._get_obs() if pooled_grid is None else frame_obs
+        for key, value in obs.items():
+            terminal[key][~terminated] = value[~terminated]
+        if self.stack is not None:
+            # every world's last frame, terminal ones included, goes on its stack before restarts clear it
+            terminal = stacked = self.stack.push(terminal)
+
+        # the level each world played this step, and the episode counts as they stood, like PlatformerEnv._info
+        level_episodes = dict(zip(self.levels, self.level_episodes.tolist()))
+        infos = [{"level": self.levels[slot], "level_episodes": level_episodes}
+                 for slot in self.simulation.world_level.tolist()]
+        if dones.any():
+            for world in np.flatnonzero(dones):
+                infos[world]["terminal_observation"] = {key: value[world] for key, value in terminal.items()}
+                infos[world]["TimeLimit.truncated"] = bool(truncated[world] and not terminated[world])
+            self._restart(dones)
+            obs = self._get_obs()
+            if pooled_grid is not None:
+                # restarted worlds begin with their first observation, the rest keep their pooled grid
+                obs["grid"] = np.where(dones[:, None, None, None], obs["grid"], pooled_grid)
+        if self.stack is not None:
+            obs = self.stack.reset(obs, dones) if dones.any() else stacked
+
+        return obs, reward.astype(np.float32), dones, infos
+
+    def close(self):
+        pass
+
+    def _indices(self, indices):
+        if indices is None:
+            return range(self.num_envs)
+        if isinstance(indices, int):
+            return [indices]
+        return indices
+
+    def get_attr(self, attr_name, indices=None):
+        return [getattr(self, attr_name) for _ in self._indices(indices)]
+
+    def _all_worlds(self, indices, action):
+        """Attributes and methods are shared by every world, so they cannot be changed for only some of them"""
+        indices = self._indices(indices)
+        if set(indices) != set(range(self.num_envs)):
+            raise NotImplementedError(f"PlatformerVecEnv cannot {action} for only worlds {list(indices)}: "
+                                      f"all {self.num_envs} share one simulation")
+        return indices
+
+    def set_attr(self, attr_name, value, indices=None):
+        self._all_worlds(indices, f"set {attr_name}")
+        setattr(self, attr_name, value)
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        indices = self._all_worlds(indices, f"call {method_name}")
+        # one call acts on every world at once
+        result = getattr(self, method_name)(*method_args, **method_kwargs)
+        return [result for _ in indices]
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False for _ in self._indices(indices)]